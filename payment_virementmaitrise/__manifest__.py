@@ -12,6 +12,8 @@
         'payment'
     ],
     'data': [
+        'security/ir.model.access.csv',
+
         'views/payment_provider_views.xml',
         'views/payment_virementmaitrise_templates.xml',
         'views/payment_templates.xml',  # Only load the SDK on pages with a payment form.
@@ -20,6 +22,7 @@
 
         'data/payment_method_data.xml',  # Payment method definitions
         'data/payment_provider_data.xml',  # Depends on views/payment_virementmaitrise_templates.xml
+        'data/ir_cron_data.xml',
     ],
     'application': True,
     'uninstall_hook': 'uninstall_hook',
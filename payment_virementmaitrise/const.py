@@ -57,10 +57,112 @@ INTENT_STATUS_MAPPING = {
     )
 }
 
+# Session statuses and transfer states of the notifications updating the transactions and payments
+WEBHOOK_PROCESSED_STATUSES = ('payment_created', 'payment_partial')
+WEBHOOK_PROCESSED_TRANSFER_STATES = ('completed', 'received', 'insufficient', 'overpaid')
+
 # Events which are handled by the webhook
 WEBHOOK_HANDLED_EVENTS = [
     'checkout.session.completed',
 ]
 
 CALLBACK_URL = f'/payment/{PAYMENT_PROVIDER_NAME}/callback'
-WEBHOOK_URL = f'/payment/{PAYMENT_PROVIDER_NAME}/webhook'
\ No newline at end of file
+WEBHOOK_URL = f'/payment/{PAYMENT_PROVIDER_NAME}/webhook'
+PAY_URL = f'/payment/{PAYMENT_PROVIDER_NAME}/pay'
+
+# Number of seconds before `expires_in` at which a cached OAuth access token is considered expired
+OAUTH_TOKEN_EXPIRY_MARGIN = 60
+
+# Default HTTP connection pool settings, overridable with the system parameters
+# `payment_virementmaitrise.http_pool_maxsize`, `.http_connect_timeout` and `.http_read_timeout`
+HTTP_POOL_MAXSIZE = 10
+HTTP_CONNECT_TIMEOUT = 10
+HTTP_READ_TIMEOUT = 60
+
+# Default number of concurrent API calls of the batch operations, overridable with the system
+# parameter `payment_virementmaitrise.batch_max_workers`
+BATCH_MAX_WORKERS = 8
+
+# Default number of queued webhook events processed per cron run, overridable with the system
+# parameter `payment_virementmaitrise.webhook_batch_size`
+WEBHOOK_BATCH_SIZE = 50
+
+# Cron jobs processing the queued webhook events. Odoo never runs a cron job twice at the same
+# time, so each of them is a worker processing its own batches in parallel with the others.
+WEBHOOK_PROCESSING_CRONS = (
+    f'{MODULE_NAME}.cron_process_webhook_events',
+    f'{MODULE_NAME}.cron_process_webhook_events_2',
+    f'{MODULE_NAME}.cron_process_webhook_events_3',
+)
+
+# Number of minutes after which an event claimed by a cron run which did not complete is claimed again
+WEBHOOK_CLAIM_TIMEOUT = 15
+
+# Default number of days during which processed webhook events are kept to reject duplicates,
+# overridable with the system parameter `payment_virementmaitrise.webhook_retention_days`
+WEBHOOK_RETENTION_DAYS = 30
+
+# First key of the advisory locks serializing the processing of the notifications of a transaction,
+# the second one being the transaction id
+WEBHOOK_LOCK_NAMESPACE = 0x564D  # 'VM'
+
+# Lock wait time, in milliseconds, above which it is logged
+WEBHOOK_LOCK_WAIT_LOG_THRESHOLD = 100
+
+# Default number of done transactions post-processed per cron run, overridable with the system
+# parameter `payment_virementmaitrise.post_process_batch_size`
+POST_PROCESS_BATCH_SIZE = 100
+
+# QR code rendering options by format, selected with the system parameter
+# `payment_virementmaitrise.qr_format`. `png_compact` targets about 300 DPI at the printed size.
+QR_FORMATS = {
+    'png': {'box_size': 20, 'border': 4},
+    'png_compact': {'box_size': 8, 'border': 4},
+    'svg': {'box_size': 10, 'border': 4},
+}
+QR_DEFAULT_FORMAT = 'png'
+
+# Maximum number of rendered QR codes kept in memory by each worker
+QR_CACHE_SIZE = 512
+
+# Maximum number of transaction ids kept in memory by each worker, by Fintecture session id
+TX_LOOKUP_CACHE_SIZE = 4096
+
+# Default number of stale draft or pending transactions whose session status is fetched per cron
+# run, overridable with the system parameter `payment_virementmaitrise.status_poll_batch_size`
+STATUS_POLL_BATCH_SIZE = 500
+
+# Default maximum number of session statuses fetched per second and provider, overridable with the
+# system parameter `payment_virementmaitrise.status_poll_rate_limit`
+STATUS_POLL_RATE_LIMIT = 10
+
+# Default number of seconds a run of the status polling cron may spend fetching statuses,
+# overridable with the system parameter `payment_virementmaitrise.status_poll_time_budget`
+STATUS_POLL_TIME_BUDGET = 240
+
+# Default number of minutes without notification after which the status of a transaction is
+# fetched, and then fetched again, overridable with the system parameter
+# `payment_virementmaitrise.status_poll_interval`
+STATUS_POLL_INTERVAL = 60
+
+# Default number of transactions with an expired session canceled per cron run, overridable with
+# the system parameter `payment_virementmaitrise.expired_session_batch_size`
+EXPIRED_SESSION_BATCH_SIZE = 1000
+
+# Default number of days after the expiry of its session before a pending transaction is canceled,
+# overridable with the system parameter `payment_virementmaitrise.expired_session_grace_days`
+EXPIRED_SESSION_GRACE_DAYS = 7
+
+# Number of seconds before its expiry from which a stored payment session is not served anymore
+SESSION_EXPIRY_MARGIN = 300
+
+# Maximum number of seconds a caller waits for the payment session requested by a concurrent one
+SESSION_REQUEST_TIMEOUT = 60
+
+# Default number of invoice payment sessions replaced per cron run, overridable with the system
+# parameter `payment_virementmaitrise.session_refresh_batch_size`
+SESSION_REFRESH_BATCH_SIZE = 200
+
+# Default number of hours before their expiry from which the invoice payment sessions are replaced,
+# overridable with the system parameter `payment_virementmaitrise.session_refresh_lead_hours`
+SESSION_REFRESH_LEAD_HOURS = 24
@@ -2,6 +2,10 @@ import logging
 
 _logger = logging.getLogger(__name__)
 
+from . import fintecture_access_token
+from . import fintecture_payment_session
+from . import fintecture_transfer
+from . import fintecture_webhook_event
 from . import payment_provider
 from . import payment_token
 from . import payment_transaction
@@ -1,5 +1,11 @@
 import logging
-from odoo import fields, models
+import uuid
+
+from werkzeug.urls import url_join
+
+from odoo import Command, _, api, fields, models
+
+from ..reconciliation import reconcile_payments_with_invoices
 
 _logger = logging.getLogger(__name__)
 
@@ -7,10 +13,11 @@ _logger = logging.getLogger(__name__)
 # It will only define the model if the 'account' module is installed
 
 try:
-    from ..const import PAYMENT_PROVIDER_NAME
+    from ..const import PAY_URL, PAYMENT_PROVIDER_NAME
 except ImportError:
     _logger.warning("payment_fintecture.const not found, account_move integration disabled")
     PAYMENT_PROVIDER_NAME = 'fintecture'
+    PAY_URL = f'/payment/{PAYMENT_PROVIDER_NAME}/pay'
 
 
 # Check if account.move model exists before trying to inherit from it
@@ -42,15 +49,28 @@ try:
 
         fintecture_is_enabled = fields.Boolean(
             string="Fintecture enabled",
-            compute="_compute_fintecture_payment_data"
+            compute="_compute_fintecture_is_enabled"
         )
+        # The link and QR code are stored and only materialized on demand (see
+        # `_fintecture_ensure_payment_data`); the compute resets them when the invoice changes.
         fintecture_payment_link = fields.Char(
             string="Fintecture payment link",
-            compute="_compute_fintecture_payment_data"
+            compute="_compute_fintecture_payment_data",
+            store=True,
+            copy=False
         )
+        # Kept in the table rather than as an attachment, so that the QR codes of many invoices are
+        # written with a single UPDATE instead of one attachment per invoice
         fintecture_payment_qr = fields.Binary(
             string="Fintecture QR",
-            compute="_compute_fintecture_payment_data"
+            compute="_compute_fintecture_payment_data",
+            store=True,
+            attachment=False,
+            copy=False
+        )
+        fintecture_payment_qr_mimetype = fields.Char(
+            string="Fintecture QR mimetype",
+            compute="_compute_fintecture_payment_qr_mimetype"
         )
         fintecture_invoice_link_qr = fields.Boolean(
             string="Include link/QR in invoices",
@@ -58,16 +78,32 @@ try:
         )
 
         def _get_fintecture_provider(self):
-            """Get the Fintecture payment provider for current company."""
-            return self.env['payment.provider'].sudo().search([
+            """Get the Fintecture payment provider of the invoice company."""
+            company = self.company_id[:1] or self.env.company
+            return self._fintecture_get_providers_by_company().get(company.id, self.env['payment.provider'])
+
+        def _fintecture_get_providers_by_company(self):
+            """Get the Fintecture payment provider of each company of the invoices, in one query.
+
+            :return: The providers, by company id
+            :rtype: dict
+            """
+            companies = self.company_id or self.env.company
+            providers = self.env['payment.provider'].sudo().search([
                 ('code', '=', PAYMENT_PROVIDER_NAME),
-                ('company_id', '=', self.env.company.id)
-            ], limit=1)
+                ('company_id', 'in', companies.ids)
+            ])
+            providers_by_company = {}
+            for provider in providers:
+                # Keep the first provider of each company, like a search with `limit=1` would
+                providers_by_company.setdefault(provider.company_id.id, provider)
+            return providers_by_company
 
         def _compute_fintecture_config(self):
             """Get provider configuration."""
-            provider = self._get_fintecture_provider()
+            providers_by_company = self._fintecture_get_providers_by_company()
             for move in self:
+                provider = providers_by_company.get(move.company_id.id)
                 if provider:
                     move.fintecture_invoice_link_qr = provider.fintecture_invoice_link_qr
                 else:
@@ -79,29 +115,35 @@ try:
             posted = super()._post(soft=soft)
 
             # After posting, try to reconcile any existing payments from eCommerce orders
-            for move in posted:
-                if move.move_type == 'out_invoice' and move.payment_state != 'paid':
-                    self._reconcile_existing_payment(move)
+            invoices = posted.filtered(lambda move: move.move_type == 'out_invoice' and move.payment_state != 'paid')
+            if invoices:
+                invoices._reconcile_existing_payments()
 
             return posted
 
-        def _reconcile_existing_payment(self, invoice):
-            """Reconcile existing payment from sale order with newly created invoice.
+        def _reconcile_existing_payments(self):
+            """Reconcile existing payments from sale orders with the newly created invoices.
 
             This handles the case where:
             1. eCommerce order paid → Payment created (in_process state)
             2. Invoice created later manually
             3. Need to link payment to invoice
+
+            The sale orders, their done transactions and payments are fetched for all the invoices
+            together and reconciled in one batch.
             """
-            # Find sale order linked to this invoice
+            if 'sale.order' not in self.env:
+                return
+
+            # Find sale orders linked to these invoices
             sale_orders = self.env['sale.order'].sudo().search([
-                ('invoice_ids', 'in', [invoice.id])
+                ('invoice_ids', 'in', self.ids)
             ])
 
             if not sale_orders:
                 return
 
-            # Find payment transactions from the sale order
+            # Find payment transactions from the sale orders
             transactions = sale_orders.transaction_ids.filtered(
                 lambda t: t.state == 'done' and t.provider_code == PAYMENT_PROVIDER_NAME
             )
@@ -109,74 +151,252 @@ try:
             if not transactions:
                 return
 
-            for tx in transactions:
-                # Find ALL payments created for this transaction (not just one)
-                # This is important for partial payments where multiple payments exist per transaction
-                payments = self.env['account.payment'].sudo().search([
-                    ('payment_transaction_id', '=', tx.id),
-                    ('state', 'in', ['posted', 'in_process']),
-                ])
+            # Find ALL payments created for these transactions (not just one)
+            # This is important for partial payments where multiple payments exist per transaction
+            payments = self.env['account.payment'].sudo().search([
+                ('payment_transaction_id', 'in', transactions.ids),
+                ('state', 'in', ['posted', 'in_process']),
+            ])
 
-                if not payments:
-                    continue
+            if not payments:
+                return
 
-                _logger.info('|AccountMove| Found %s existing payment(s) for invoice %s, attempting reconciliation',
-                           len(payments), invoice.name)
+            payments_by_tx_id = payments.grouped(lambda payment: payment.payment_transaction_id.id)
+            invoice_ids = set(self.ids)
+            pairs = []
+            for order in sale_orders:
+                order_payments = [
+                    payment
+                    for tx in order.transaction_ids
+                    for payment in payments_by_tx_id.get(tx.id, ())
+                ]
+                for invoice in order.invoice_ids:
+                    if invoice.id in invoice_ids:
+                        pairs.extend((payment, invoice) for payment in order_payments)
+
+            _logger.info('|AccountMove| Found %s existing payment(s) for %s invoice(s), attempting reconciliation',
+                       len(payments), len(self))
+
+            # Reconcile each payment with its invoices
+            reconcile_payments_with_invoices(payments.env, pairs)
+
+        def _fintecture_ensure_access_tokens(self):
+            """Generate the missing portal access tokens of the invoices.
+
+            The tokens are assigned together and flushed by the ORM in a single batched UPDATE,
+            instead of one write per invoice as `_portal_ensure_token` would do.
+            """
+            for move in self.filtered(lambda m: not m.access_token).sudo():
+                move.access_token = str(uuid.uuid4())
 
-                # Reconcile each payment with the invoice
-                for payment in payments:
-                    if not payment.move_id:
-                        _logger.debug('|AccountMove| Payment %s has no move_id, skipping', payment.name)
-                        continue
+        def _fintecture_get_deferred_payment_url(self):
+            """Return the stable URL creating the payment session of the invoice when opened.
 
-                    # Get receivable lines from both invoice and payment
-                    invoice_lines = invoice.line_ids.filtered(
-                        lambda l: l.account_id.account_type == 'asset_receivable' and not l.reconciled
-                    )
-                    payment_lines = payment.move_id.line_ids.filtered(
-                        lambda l: l.account_id.account_type == 'asset_receivable' and not l.reconciled
-                    )
-
-                    lines_to_reconcile = invoice_lines + payment_lines
-
-                    if len(lines_to_reconcile) >= 2:
-                        try:
-                            lines_to_reconcile.reconcile()
-
-                            # After reconciliation, update payment state
-                            payment.invalidate_recordset(['is_reconciled', 'is_matched'])
-                            invoice.invalidate_recordset(['payment_state'])
-
-                            # Force recompute by accessing the fields
-                            is_reconciled = payment.is_reconciled
-                            is_matched = payment.is_matched
-
-                            # If payment is now fully reconciled, transition to 'paid'
-                            if payment.state == 'in_process' and (is_reconciled or is_matched):
-                                payment.write({'state': 'paid'})
-                                _logger.info('|AccountMove| Reconciled payment %s with invoice %s (state: paid)',
-                                           payment.name, invoice.name)
-                            else:
-                                _logger.debug('|AccountMove| Reconciled payment %s (state: %s)', payment.name, payment.state)
-
-                        except Exception as e:
-                            _logger.warning('|AccountMove| Error reconciling payment %s: %s', payment.name, str(e))
-                    else:
-                        _logger.debug('|AccountMove| Not enough lines for %s (found %s, need 2)',
-                                    payment.name, len(lines_to_reconcile))
+            The access token of the invoice must have been generated beforehand with
+            `_fintecture_ensure_access_tokens`.
+            """
+            self.ensure_one()
+            return url_join(self.get_base_url(), f'{PAY_URL}/{self.id}/{self.access_token}')
 
-        def _compute_fintecture_payment_data(self):
-            """Compute Fintecture payment link and QR code for invoices."""
-            _logger.info('|AccountMove| Computing Fintecture payment data for %s invoices', len(self))
+        def _fintecture_get_or_create_transaction(self, provider):
+            """Return the Fintecture transaction of the invoice, creating it if needed.
+
+            :param provider: The Fintecture provider of the invoice company
+            :return: The transaction, or an empty recordset if it could not be created
+            """
+            self.ensure_one()
+            txs_by_move = self._fintecture_get_or_create_transactions({self.company_id.id: provider})
+            return txs_by_move.get(self, self.env['payment.transaction'])
+
+        def _fintecture_get_or_create_transactions(self, providers_by_company):
+            """Return the Fintecture transaction of each invoice, creating the missing ones at once.
+
+            :param dict providers_by_company: The Fintecture provider of each company, by company id
+            :return: The transaction of each invoice, by invoice
+            :rtype: dict
+            """
+            txs_by_move = {}
+            moves_without_tx = []
+
+            # Look for existing transactions, the links of all the invoices are fetched together. The
+            # transactions canceled when their session expired are replaced, and so are the draft ones
+            # requested for an amount, currency or partner the invoice no longer has.
+            moves_with_closed_tx = set()
+            outdated_txs = []
+            for move in self:
+                fintecture_txs = move.transaction_ids.filtered(
+                    lambda x: x.provider_id and x.provider_id.code == PAYMENT_PROVIDER_NAME
+                )
+                trx = fintecture_txs.filtered(lambda x: x.state in ('draft', 'pending'))[:1]
+                if trx.state == 'draft' and move._fintecture_is_transaction_outdated(trx):
+                    _logger.info('|AccountMove| Invoice %s changed since transaction %s was created, replacing it',
+                                 move.name, trx.reference)
+                    outdated_txs.append(trx)
+                    trx = trx.browse()
+                if fintecture_txs and not trx:
+                    moves_with_closed_tx.add(move)
+                if trx:
+                    _logger.debug('|AccountMove| Found existing transaction %s for invoice %s', trx.id, move.name)
+                    txs_by_move[move] = trx
+                else:
+                    moves_without_tx.append(move)
+
+            if outdated_txs:
+                self.env['payment.transaction'].union(*outdated_txs).sudo()._set_canceled(
+                    state_message=_("The invoice changed since the payment session was requested.")
+                )
+
+            if not moves_without_tx:
+                return txs_by_move
+
+            _logger.debug('|AccountMove| No existing transaction for %s invoices, creating them', len(moves_without_tx))
+
+            # Get the default payment method for this provider
+            payment_method = self.env['payment.method'].sudo().search([
+                ('code', '=', f'{PAYMENT_PROVIDER_NAME}_bank_transfer'),
+            ], limit=1)
+
+            if not payment_method:
+                _logger.error('|AccountMove| No payment method found for provider %s', PAYMENT_PROVIDER_NAME)
+                return txs_by_move
+
+            # Create all the transactions with a single `create`, linked to their invoice
+            txs = self.env['payment.transaction'].sudo().create([{
+                'provider_id': providers_by_company[move.company_id.id].id,
+                'payment_method_id': payment_method.id,
+                'reference': (
+                    self.env['payment.transaction']._compute_reference(PAYMENT_PROVIDER_NAME, prefix=move.name)
+                    if move in moves_with_closed_tx else move.name
+                ),
+                'amount': move.amount_residual,
+                'currency_id': move.currency_id.id,
+                'partner_id': move.partner_id.id,
+                'operation': 'online_redirect',
+                'invoice_ids': [Command.set([move.id])],
+            } for move in moves_without_tx])
+            txs_by_move.update(zip(moves_without_tx, txs))
+            return txs_by_move
+
+        def _fintecture_is_transaction_outdated(self, trx):
+            """Check whether the transaction no longer matches the amount, currency or partner of the invoice.
+
+            :param trx: The Fintecture transaction of the invoice
+            :return: Whether the payment session of the transaction would charge outdated values
+            :rtype: bool
+            """
+            self.ensure_one()
+            return (
+                trx.partner_id != self.partner_id
+                or trx.currency_id != self.currency_id
+                or self.currency_id.compare_amounts(trx.amount, self.amount_residual) != 0
+            )
 
+        def _fintecture_get_payment_session_url(self):
+            """Return the Fintecture payment URL of the invoice, creating the session if needed.
+
+            :return: The payment URL, or False if no session could be created
+            :rtype: str
+            """
+            self.ensure_one()
             provider = self._get_fintecture_provider()
+            if not provider or provider.state == 'disabled':
+                return False
+
+            trx = self._fintecture_get_or_create_transaction(provider)
+            if not trx:
+                return False
+            if trx.state == 'draft':
+                trx._get_processing_values()
+            # The expired session of a pending transaction is kept but never served
+            return trx.fintecture_url if trx._fintecture_has_valid_session() else False
+
+        def _compute_fintecture_is_enabled(self):
+            """Check whether the invoices can be paid with Fintecture."""
+            providers_by_company = self._fintecture_get_providers_by_company()
+            for move in self:
+                provider = providers_by_company.get(move.company_id.id)
+                move.fintecture_is_enabled = bool(provider) and provider.state != 'disabled' and move.state != 'draft'
+
+        @api.depends('amount_residual', 'state', 'partner_id', 'currency_id')
+        def _compute_fintecture_payment_data(self):
+            """Reset the stored payment link and QR code when something they depend on changes.
 
+            They are materialized again by `_fintecture_ensure_payment_data` the next time they are
+            needed, so that no remote call happens when the invoice is merely modified.
+            """
             for move in self:
-                # Reset values
-                move.fintecture_is_enabled = False
                 move.fintecture_payment_link = False
                 move.fintecture_payment_qr = False
 
+        @api.depends('fintecture_payment_qr')
+        def _compute_fintecture_payment_qr_mimetype(self):
+            """Get the mimetype of the QR code, which depends on the configured rendering format."""
+            for move in self:
+                move.fintecture_payment_qr_mimetype = self.env['payment.transaction']._fintecture_get_qr_mimetype(
+                    move.fintecture_payment_qr
+                )
+
+        def _fintecture_ensure_payment_data(self):
+            """Materialize the payment link and QR code of the invoices which do not have them yet.
+
+            Called by the invoice report with all the invoices it renders, so that they are
+            materialized in batch on the first call and the next ones find the data already stored.
+
+            :return: True
+            """
+            moves = self.filtered(
+                lambda m: m.fintecture_is_enabled
+                and m.fintecture_invoice_link_qr
+                and not (m.fintecture_payment_link and m.fintecture_payment_qr)
+            )
+            if moves:
+                moves._fintecture_materialize_payment_data()
+            return True
+
+        @api.model
+        def _fintecture_reset_payment_data(self, companies, cancel_sessions=False):
+            """Reset the stored payment data of the invoices of the given companies.
+
+            Called when the configuration of their provider changes.
+
+            :param companies: The companies whose provider changed, as a `res.company` recordset
+            :param bool cancel_sessions: Whether the draft transactions holding a session requested
+                                         with the former credentials are canceled, to be replaced
+            """
+            moves = self.sudo().search([
+                ('company_id', 'in', companies.ids),
+                ('fintecture_payment_link', '!=', False),
+            ])
+            _logger.info('|AccountMove| Resetting Fintecture payment data of %s invoices', len(moves))
+            moves.write({'fintecture_payment_link': False, 'fintecture_payment_qr': False})
+
+            if cancel_sessions:
+                txs = self.env['payment.transaction'].sudo().search([
+                    ('provider_code', '=', PAYMENT_PROVIDER_NAME),
+                    ('company_id', 'in', companies.ids),
+                    ('state', '=', 'draft'),
+                    ('fintecture_url', '!=', False),
+                ])
+                _logger.info('|AccountMove| Canceling %s draft transactions of the former configuration', len(txs))
+                txs._set_canceled(state_message=_("The Fintecture configuration changed since the payment session was requested."))
+
+        def _fintecture_materialize_payment_data(self):
+            """Compute and store the Fintecture payment link and QR code of the invoices.
+
+            The invoices are processed in batch: the providers and the payment method are looked up
+            once, the missing transactions are created together and their payment sessions are
+            requested with `_fintecture_create_request_pay_batch`.
+            """
+            _logger.info('|AccountMove| Computing Fintecture payment data for %s invoices', len(self))
+
+            providers_by_company = self._fintecture_get_providers_by_company()
+            tx_model = self.env['payment.transaction']
+
+            deferred_moves = []
+            session_moves = []
+            for move in self:
+                provider = providers_by_company.get(move.company_id.id)
+
                 # Check if provider is enabled
                 if not provider or provider.state == 'disabled':
                     _logger.debug('|AccountMove| Fintecture provider disabled for invoice %s', move.name)
@@ -187,56 +407,68 @@ try:
                     _logger.debug('|AccountMove| Invoice %s is in draft state, skipping', move.name)
                     continue
 
-                move.fintecture_is_enabled = True
+                if provider.fintecture_invoice_link_mode == 'deferred':
+                    deferred_moves.append(move)
+                else:
+                    session_moves.append(move)
 
-                # Look for existing transaction
-                trx = move.transaction_ids.filtered(
-                    lambda x: x.provider_id and x.provider_id.code == PAYMENT_PROVIDER_NAME
+            if session_moves:
+                txs_by_move = self.browse(move.id for move in session_moves)._fintecture_get_or_create_transactions(
+                    providers_by_company
                 )
-
-                if not trx:
-                    _logger.debug('|AccountMove| No existing transaction for invoice %s, creating one', move.name)
-
-                    # Get the default payment method for this provider
-                    payment_method = self.env['payment.method'].sudo().search([
-                        ('code', '=', f'{PAYMENT_PROVIDER_NAME}_bank_transfer'),
-                    ], limit=1)
-
-                    if not payment_method:
-                        _logger.error('|AccountMove| No payment method found for provider %s', PAYMENT_PROVIDER_NAME)
+                txs = tx_model.union(*txs_by_move.values())
+                errors = txs.filtered(
+                    lambda tx: tx.state == 'draft' and not tx._fintecture_has_valid_session()
+                )._fintecture_create_request_pay_batch()
+
+                for move, trx in txs_by_move.items():
+                    if trx.state != 'draft' and trx.fintecture_url and not trx._fintecture_has_valid_session():
+                        # The expired session of a pending transaction is not replaced, the deferred link
+                        # sends the customer to the invoice until the transaction is closed
+                        deferred_moves.append(move)
+                        continue
+                    if trx.id in errors or not trx.fintecture_url:
+                        _logger.warning('|AccountMove| No Fintecture URL for invoice %s', move.name)
                         continue
 
-                    # Create transaction
-                    trx = self.env['payment.transaction'].sudo().create({
-                        'provider_id': provider.id,
-                        'payment_method_id': payment_method.id,
-                        'reference': move.name,
-                        'amount': move.amount_residual,
-                        'currency_id': move.currency_id.id,
-                        'partner_id': move.partner_id.id,
-                        'operation': 'online_redirect',
+                    # The values differ per invoice but are flushed by the ORM in a single batched UPDATE
+                    move.write({
+                        'fintecture_payment_link': trx.fintecture_url,
+                        'fintecture_payment_qr': trx.fintecture_create_qr(),
                     })
-                    move.transaction_ids = [(4, trx.id)]
-                else:
-                    trx = trx[0]
-                    _logger.debug('|AccountMove| Found existing transaction %s for invoice %s', trx.id, move.name)
-
-                # Get processing values (this creates the Fintecture URL)
-                try:
-                    trx._get_processing_values()
-                    move.fintecture_payment_link = trx.fintecture_url
+                _logger.info('|AccountMove| Generated payment data for %s invoices', len(txs_by_move) - len(errors))
 
-                    _logger.info('|AccountMove| Generating QR code for invoice %s (URL: %s)', move.name, trx.fintecture_url)
+            if not deferred_moves:
+                return
 
-                    if trx.fintecture_url:
-                        move.fintecture_payment_qr = trx.fintecture_create_qr()
-                        _logger.info('|AccountMove| QR code generated successfully for invoice %s', move.name)
-                    else:
-                        _logger.warning('|AccountMove| No Fintecture URL for invoice %s', move.name)
+            # The session is only created when the customer opens the link, see
+            # `FintectureController.fintecture_pay_invoice`
+            self.browse(move.id for move in deferred_moves)._fintecture_ensure_access_tokens()
+            for move in deferred_moves:
+                payment_link = move._fintecture_get_deferred_payment_url()
+                move.write({
+                    'fintecture_payment_link': payment_link,
+                    'fintecture_payment_qr': tx_model._fintecture_render_qr(payment_link),
+                })
+
+    class PaymentTransaction(models.Model):
+        _inherit = 'payment.transaction'
+
+        # Denormalized from `invoice_ids` so that the webhook processing reads the invoice without
+        # joining the relation table
+        fintecture_invoice_id = fields.Many2one(
+            string="Fintecture Invoice",
+            comodel_name='account.move',
+            compute='_compute_fintecture_invoice_id',
+            store=True,
+            index='btree_not_null',
+            readonly=True
+        )
 
-                except Exception as e:
-                    _logger.error('|AccountMove| Error generating payment data for invoice %s: %s', move.name, str(e))
-                    _logger.exception('|AccountMove| Full exception:')
+        @api.depends('invoice_ids', 'provider_id')
+        def _compute_fintecture_invoice_id(self):
+            for tx in self:
+                tx.fintecture_invoice_id = tx.invoice_ids[:1] if tx.provider_code == PAYMENT_PROVIDER_NAME else False
 
 except ImportError:
     # account.move not available - this is expected when account module is not installed
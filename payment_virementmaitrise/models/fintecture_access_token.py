@@ -0,0 +1,123 @@
+import logging
+
+from psycopg2.errors import SerializationFailure
+
+from odoo import api, fields, models
+
+from ..const import OAUTH_TOKEN_EXPIRY_MARGIN
+
+_logger = logging.getLogger(__name__)
+
+# Number of attempts to read the shared token when a concurrent worker refreshed it meanwhile
+SHARED_TOKEN_MAX_ATTEMPTS = 3
+
+
+class FintectureAccessToken(models.Model):
+    """ OAuth access token shared by all the workers and servers using the same database.
+
+    The row of a provider is locked with `SELECT ... FOR UPDATE` while its token is refreshed, so
+    that exactly one worker calls the OAuth endpoint and the others reuse its result.
+    """
+    _name = 'fintecture.access.token'
+    _description = 'Fintecture Shared Access Token'
+
+    provider_id = fields.Many2one(
+        comodel_name='payment.provider',
+        required=True,
+        ondelete='cascade'
+    )
+    app_id = fields.Char(
+        string="PIS Application ID"
+    )
+    environment = fields.Char(
+        string="Environment",
+        help="The provider state for which the token was issued"
+    )
+    access_token = fields.Char(
+        string="Access Token",
+        groups='base.group_system'
+    )
+    expires_at = fields.Datetime(
+        string="Expires At"
+    )
+
+    _sql_constraints = [
+        ('provider_uniq', 'unique(provider_id)', "A provider can only have one shared access token."),
+    ]
+
+    @api.model
+    def _get_shared_access_token(self, provider, request_token, stale_token=None):
+        """ Return the token shared between workers for the given provider, refreshing it if needed.
+
+        The lookup runs in its own short-lived transaction so that the row lock is released as soon
+        as the token is known, independently of the current request.
+
+        :param recordset provider: The provider, as a `payment.provider` record
+        :param callable request_token: Called while holding the lock to get a new token, must
+                                       return a tuple (access_token, expires_in)
+        :param str stale_token: A token rejected by the API which must not be reused
+        :return: The access token and its remaining lifetime in seconds
+        :rtype: tuple
+        """
+        for attempt in range(1, SHARED_TOKEN_MAX_ATTEMPTS + 1):
+            try:
+                with self.env.registry.cursor() as cr:
+                    return self._lock_and_get_token(cr, provider, request_token, stale_token)
+            except SerializationFailure:
+                # Another worker refreshed the token while we were waiting for the lock; its result
+                # is only visible from a new transaction.
+                _logger.debug('|FintectureAccessToken| Concurrent refresh detected (attempt %s)', attempt)
+                if attempt == SHARED_TOKEN_MAX_ATTEMPTS:
+                    raise
+
+    @api.model
+    def _lock_and_get_token(self, cr, provider, request_token, stale_token):
+        """ Lock the token row of the provider with `cr` and return a valid token from it.
+
+        See `_get_shared_access_token` for the parameters.
+        """
+        cr.execute("""
+            INSERT INTO fintecture_access_token (provider_id, create_uid, create_date, write_uid, write_date)
+                 VALUES (%(provider_id)s, %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC')
+            ON CONFLICT (provider_id) DO NOTHING
+        """, {'provider_id': provider.id, 'uid': self.env.uid})
+        cr.execute("""
+            SELECT app_id, environment, access_token,
+                   EXTRACT(EPOCH FROM expires_at - (NOW() AT TIME ZONE 'UTC'))
+              FROM fintecture_access_token
+             WHERE provider_id = %s
+               FOR UPDATE
+        """, [provider.id])
+        app_id, environment, access_token, expires_in = cr.fetchone()
+
+        if (
+            access_token
+            and access_token != stale_token
+            and app_id == provider.fintecture_pis_app_id
+            and environment == provider.state
+            and expires_in is not None
+            and expires_in > OAUTH_TOKEN_EXPIRY_MARGIN
+        ):
+            _logger.debug('|FintectureAccessToken| Reusing shared access token of provider %s', provider.id)
+            return access_token, float(expires_in)
+
+        _logger.info('|FintectureAccessToken| Refreshing shared access token of provider %s', provider.id)
+        access_token, expires_in = request_token()
+        cr.execute("""
+            UPDATE fintecture_access_token
+               SET app_id = %(app_id)s,
+                   environment = %(environment)s,
+                   access_token = %(access_token)s,
+                   expires_at = (NOW() AT TIME ZONE 'UTC') + %(expires_in)s * INTERVAL '1 second',
+                   write_uid = %(uid)s,
+                   write_date = NOW() AT TIME ZONE 'UTC'
+             WHERE provider_id = %(provider_id)s
+        """, {
+            'app_id': provider.fintecture_pis_app_id,
+            'environment': provider.state,
+            'access_token': access_token,
+            'expires_in': float(expires_in or 0),
+            'uid': self.env.uid,
+            'provider_id': provider.id,
+        })
+        return access_token, expires_in
@@ -0,0 +1,28 @@
+from odoo import fields, models
+
+
+class FintecturePaymentSession(models.Model):
+    """ Payment session of a transaction replaced by a newer one.
+
+    A session is replaced before it expires (see `_cron_fintecture_refresh_expiring_sessions`), so
+    its link, already printed or sent on invoices, can still be paid. The unique index on the
+    session id keeps the notifications of these sessions matched with their transaction.
+    """
+    _name = 'fintecture.payment.session'
+    _description = 'Fintecture Payment Session'
+    _order = 'id'
+
+    transaction_id = fields.Many2one(
+        comodel_name='payment.transaction',
+        required=True,
+        index=True,
+        ondelete='cascade'
+    )
+    session_id = fields.Char(
+        string="Session ID",
+        required=True
+    )
+
+    _sql_constraints = [
+        ('session_id_uniq', 'unique(session_id)', "A payment session belongs to a single transaction."),
+    ]
@@ -0,0 +1,42 @@
+from odoo import fields, models
+
+
+class FintectureTransfer(models.Model):
+    """ Transfer received through Fintecture for a transaction.
+
+    A transaction paid in several times has one transfer per payment. The unique index on the
+    Fintecture transaction id makes recording a notified transfer a single insert-or-skip, which
+    tells new transfers apart from repeated notifications without reading the existing payments.
+    """
+    _name = 'fintecture.transfer'
+    _description = 'Fintecture Transfer'
+    _order = 'id'
+
+    transaction_id = fields.Many2one(
+        comodel_name='payment.transaction',
+        required=True,
+        index=True,
+        ondelete='cascade'
+    )
+    fintecture_transaction_id = fields.Char(
+        string="Fintecture Transaction ID",
+        help="The id of the transfer at Fintecture, or the session and received total for the "
+             "transfers notified without one",
+        required=True
+    )
+    currency_id = fields.Many2one(
+        related='transaction_id.currency_id'
+    )
+    amount = fields.Monetary(
+        string="Amount",
+        currency_field='currency_id'
+    )
+    received_amount = fields.Monetary(
+        string="Received Amount",
+        help="The total received for the transaction, including this transfer",
+        currency_field='currency_id'
+    )
+
+    _sql_constraints = [
+        ('fintecture_transaction_id_uniq', 'unique(fintecture_transaction_id)', "A transfer can only be recorded once."),
+    ]
@@ -0,0 +1,437 @@
+import hashlib
+import json
+import logging
+import time
+
+from psycopg2.extensions import TransactionRollbackError
+
+from odoo import api, fields, models
+
+from .. import const
+from .. import utils as fintecture_utils
+from ..const import PAYMENT_PROVIDER_NAME
+from ..webhook import WebhookEventContext
+
+_logger = logging.getLogger(__name__)
+
+
+class FintectureWebhookEvent(models.Model):
+    """ Webhook notification received from Fintecture, queued until it is processed.
+
+    The webhook endpoint only verifies the signature and stores the event, so that Fintecture gets
+    its acknowledgement at once. The queued events are processed by several worker cron jobs (see
+    `const.WEBHOOK_PROCESSING_CRONS`), which Odoo runs in parallel in different workers or nodes.
+    Each run claims a batch of events with `FOR UPDATE SKIP LOCKED` and marks them as processing,
+    so that the runs never pick the same event.
+
+    The table also serves as idempotency store: an event whose request id or fingerprint is already
+    known is rejected by the unique indexes when it is queued. Processed events are removed after a
+    retention period.
+    """
+    _name = 'fintecture.webhook.event'
+    _description = 'Fintecture Webhook Event'
+    _order = 'received_at, id'
+    _rec_name = 'session_id'
+
+    provider_id = fields.Many2one(
+        comodel_name='payment.provider',
+        required=True,
+        ondelete='cascade'
+    )
+    request_id = fields.Char(
+        string="Request ID",
+        help="The X-Request-ID header of the notification"
+    )
+    fingerprint = fields.Char(
+        string="Fingerprint",
+        help="A hash of the session, statuses, received amount and transfer of the notification, "
+             "empty when it does not identify its transfer"
+    )
+    session_id = fields.Char(
+        string="Session ID",
+        index=True
+    )
+    status = fields.Char(
+        string="Session Status"
+    )
+    transfer_state = fields.Char(
+        string="Transfer State"
+    )
+    headers = fields.Text(
+        string="Headers",
+        help="The signature headers of the notification, as JSON"
+    )
+    payload = fields.Text(
+        string="Payload",
+        help="The form data of the notification, as JSON"
+    )
+    received_at = fields.Datetime(
+        string="Received At",
+        required=True,
+        default=fields.Datetime.now,
+        index=True
+    )
+    processed_at = fields.Datetime(
+        string="Processed At"
+    )
+    state = fields.Selection(
+        string="Status",
+        selection=[('pending', "Pending"), ('processing', "Processing"), ('done', "Done"), ('error', "Error")],
+        required=True,
+        default='pending',
+        index=True
+    )
+    claimed_at = fields.Datetime(
+        string="Claimed At",
+        help="When a cron run claimed the event for processing"
+    )
+    error_message = fields.Text(
+        string="Error Message"
+    )
+    lock_wait_time = fields.Float(
+        string="Lock Wait Time (ms)",
+        help="The time spent waiting for the events of the same transaction to be processed"
+    )
+
+    _sql_constraints = [
+        ('request_id_uniq', 'unique(request_id)', "A webhook notification can only be queued once."),
+        ('fingerprint_uniq', 'unique(fingerprint)', "A webhook notification can only be queued once."),
+    ]
+
+    @api.model
+    def _enqueue(self, provider, event, payload, headers):
+        """ Store a verified webhook notification and wake up the cron job processing it.
+
+        Duplicates of an already queued notification are skipped by a single insert relying on the
+        unique indexes, without reading anything first.
+
+        :param recordset provider: The provider which verified the signature, as a `payment.provider` record
+        :param dict event: The event returned by the signature verification
+        :param dict payload: The form data of the notification
+        :param dict headers: The signature headers of the notification
+        :return: The queued event
+        :rtype: recordset of `fintecture.webhook.event`
+        """
+        self.env.cr.execute("""
+            INSERT INTO fintecture_webhook_event (
+                provider_id, request_id, fingerprint, session_id, status, transfer_state, headers,
+                payload, received_at, state, create_uid, create_date, write_uid, write_date
+            )
+            VALUES (
+                %(provider_id)s, %(request_id)s, %(fingerprint)s, %(session_id)s, %(status)s,
+                %(transfer_state)s, %(headers)s, %(payload)s, NOW() AT TIME ZONE 'UTC', 'pending',
+                %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+            )
+            ON CONFLICT DO NOTHING
+            RETURNING id
+        """, {
+            'provider_id': provider.id,
+            'request_id': headers.get('X-Request-ID'),
+            'fingerprint': self._get_fingerprint(event, payload),
+            'session_id': event.get('session_id'),
+            'status': event.get('status'),
+            'transfer_state': event.get('transfer_state'),
+            'headers': json.dumps(headers),
+            'payload': json.dumps(payload),
+            'uid': self.env.uid,
+        })
+        row = self.env.cr.fetchone()
+        if not row:
+            _logger.info('|FintectureWebhookEvent| Skipping duplicate webhook for session %s (request %s)',
+                         event.get('session_id'), headers.get('X-Request-ID'))
+            return self.browse()
+
+        webhook_event = self.browse(row[0])
+        _logger.info('|FintectureWebhookEvent| Queued webhook event %s for session %s',
+                     webhook_event.id, webhook_event.session_id)
+        self.env.ref('payment_virementmaitrise.cron_process_webhook_events')._trigger()
+        return webhook_event
+
+    @api.model
+    def _is_known_request(self, request_id):
+        """ Return whether a notification with the given request id was already queued.
+
+        This lets the webhook endpoint drop retried notifications before verifying them.
+
+        :param str request_id: The X-Request-ID header of the notification
+        :return: Whether the request id is known
+        :rtype: bool
+        """
+        if not request_id:
+            return False
+        self.env.cr.execute("SELECT 1 FROM fintecture_webhook_event WHERE request_id = %s", [request_id])
+        return bool(self.env.cr.fetchone())
+
+    @api.model
+    def _get_fingerprint(self, event, payload):
+        """ Return the hash identifying the notification independently of its request id.
+
+        A notification giving neither the transfer id nor the total received cannot be told apart
+        from another transfer of the same session, possibly of the same amount: it has no
+        fingerprint and is only deduplicated by its request id.
+
+        :param dict event: The event returned by the signature verification
+        :param dict payload: The form data of the notification
+        :return: The fingerprint, or None if the notification does not identify its transfer
+        :rtype: str
+        """
+        if not payload.get('transaction_id') and not payload.get('received_amount'):
+            return None
+        values = [
+            event.get('session_id'),
+            event.get('status'),
+            event.get('transfer_state'),
+            payload.get('received_amount'),
+            payload.get('transaction_id'),
+        ]
+        return hashlib.sha256(json.dumps(values).encode()).hexdigest()
+
+    @api.model
+    def _cron_process_events(self):
+        """ Process a batch of the queued webhook events.
+
+        The batch size is set with the system parameter `payment_virementmaitrise.webhook_batch_size`.
+        While events remain queued after the batch is claimed, the other worker cron jobs are
+        triggered so that they process the next batches in parallel. When events remain, the cron
+        job is run again right away.
+        """
+        batch_size = fintecture_utils.get_int_param(self.env, 'webhook_batch_size', const.WEBHOOK_BATCH_SIZE)
+        events = self._claim_events(batch_size)
+        if events and self.search_count([('state', '=', 'pending')], limit=1):
+            self._trigger_processing_crons()
+
+        _logger.info('|FintectureWebhookEvent| Processing %s queued webhook events...', len(events))
+        # Outside of tests, each event is processed and committed in its own database transaction
+        auto_commit = fintecture_utils.can_commit()
+        if auto_commit:
+            self.env.cr.commit()
+        for event in events:
+            if auto_commit:
+                event._process_in_own_transaction()
+            else:
+                event._process()
+
+        remaining = self.search_count([('state', '=', 'pending')])
+        self.env['ir.cron']._notify_progress(done=len(events), remaining=remaining)
+
+    @api.model
+    def _claim_events(self, limit):
+        """ Claim a batch of the queued events for the current run.
+
+        The events are locked with `SKIP LOCKED`, so that the events being claimed by a concurrent
+        run are left to it instead of being waited for, and marked as processing so that they are
+        not claimed again once the lock is released. The events claimed by a run which crashed are
+        claimed again after `const.WEBHOOK_CLAIM_TIMEOUT` minutes.
+
+        :param int limit: The maximum number of events to claim
+        :return: The claimed events
+        :rtype: recordset of `fintecture.webhook.event`
+        """
+        self.env.cr.execute("""
+            UPDATE fintecture_webhook_event
+               SET state = 'processing', claimed_at = NOW() AT TIME ZONE 'UTC'
+             WHERE id IN (
+                    SELECT id
+                      FROM fintecture_webhook_event
+                     WHERE state = 'pending'
+                        OR (state = 'processing'
+                            AND claimed_at < (NOW() AT TIME ZONE 'UTC') - %s * INTERVAL '1 minute')
+                  ORDER BY received_at, id
+                     LIMIT %s
+                       FOR UPDATE SKIP LOCKED
+                   )
+         RETURNING id
+        """, [const.WEBHOOK_CLAIM_TIMEOUT, limit])
+        event_ids = [row[0] for row in self.env.cr.fetchall()]
+        self.invalidate_model(['state', 'claimed_at'])
+        return self.search([('id', 'in', event_ids)])
+
+    def _process_in_own_transaction(self):
+        """ Process the event in a database transaction started once the processing lock of its
+        transaction is held, and commit it.
+
+        The lock is taken at session level and the processing only starts after a commit, so that
+        its snapshot includes the changes of the previous holder of the lock instead of failing to
+        serialize with them. A single lock is held at a time, so that the runs cannot deadlock.
+
+        Note: self.ensure_one()
+        """
+        self.ensure_one()
+        tx_id = self.env['payment.transaction'].sudo()._fintecture_get_tx_by_session(self.session_id).id \
+            if self.session_id else False
+        if not tx_id:
+            self._process()
+            self.env.cr.commit()
+            return
+
+        start = time.monotonic()
+        self.env.cr.execute("SELECT pg_advisory_lock(%s, %s)", [const.WEBHOOK_LOCK_NAMESPACE, tx_id])
+        lock_wait_time = (time.monotonic() - start) * 1000
+        try:
+            self.env.cr.commit()
+            self.env.invalidate_all()
+            self.lock_wait_time = lock_wait_time
+            self._process()
+            self.env.cr.commit()
+        except Exception:
+            # Release the lock from a usable transaction, the pooled connection outlives this run
+            self.env.cr.rollback()
+            raise
+        finally:
+            self.env.cr.execute("SELECT pg_advisory_unlock(%s, %s)", [const.WEBHOOK_LOCK_NAMESPACE, tx_id])
+
+    @api.model
+    def _trigger_processing_crons(self):
+        """ Wake up all the worker cron jobs processing the queued events. """
+        for xmlid in const.WEBHOOK_PROCESSING_CRONS:
+            cron = self.env.ref(xmlid, raise_if_not_found=False)
+            if cron:
+                cron._trigger()
+
+    @api.model
+    def _cron_sweep_events(self):
+        """ Delete the processed events older than the retention period.
+
+        The period is set in days with the system parameter `payment_virementmaitrise.webhook_retention_days`.
+        The events in error are kept for investigation.
+        """
+        retention_days = fintecture_utils.get_int_param(
+            self.env, 'webhook_retention_days', const.WEBHOOK_RETENTION_DAYS
+        )
+        self.env.cr.execute("""
+            DELETE FROM fintecture_webhook_event
+             WHERE state = 'done'
+               AND received_at < (NOW() AT TIME ZONE 'UTC') - %s * INTERVAL '1 day'
+        """, [retention_days])
+        _logger.info('|FintectureWebhookEvent| Deleted %s processed webhook events', self.env.cr.rowcount)
+
+    def _process(self):
+        """ Process the event and record its outcome, without raising.
+
+        Note: self.ensure_one()
+        """
+        self.ensure_one()
+        try:
+            with self.env.cr.savepoint():
+                self._process_notification(json.loads(self.payload))
+        except TransactionRollbackError as e:
+            # Serialization failures and deadlocks with other writers of the same records: the
+            # notification is valid, queue the event again to process it from a new transaction
+            _logger.info('|FintectureWebhookEvent| Concurrent update while processing webhook event %s, '
+                         'retrying on the next run: %s', self.id, str(e))
+            self.state = 'pending'
+        except Exception as e:
+            _logger.error('|FintectureWebhookEvent| Error processing webhook event %s: %s', self.id, str(e))
+            _logger.exception('|FintectureWebhookEvent| Full exception:')
+            self.write({
+                'state': 'error',
+                'error_message': str(e),
+                'processed_at': fields.Datetime.now(),
+            })
+        else:
+            self.write({
+                'state': 'done',
+                'processed_at': fields.Datetime.now(),
+            })
+
+    def _process_notification(self, notification_data):
+        """ Update the transaction, payments, invoice and sale order from the notification.
+
+        The notification is parsed and its records are resolved once, in a `WebhookEventContext`
+        shared by all the processing stages.
+
+        Note: self.ensure_one()
+
+        :param dict notification_data: The form data of the notification
+        :return: None
+        """
+        self.ensure_one()
+        if self.status in const.WEBHOOK_PROCESSED_STATUSES and \
+                self.transfer_state in const.WEBHOOK_PROCESSED_TRANSFER_STATES:
+            _logger.info("|FintectureWebhookEvent| Processing webhook for session=%s (status=%s, transfer_state=%s)",
+                       self.session_id, self.status, self.transfer_state)
+
+            context = WebhookEventContext.from_notification(notification_data)
+            tx_sudo = self.env['payment.transaction'].sudo()._get_tx_from_notification_data(
+                PAYMENT_PROVIDER_NAME, notification_data
+            )
+
+            # Serialize the events of the same transaction, those of other transactions keep running
+            # in parallel. The lock is held until the end of the database transaction, and taken at
+            # once when the cron run already holds it, see `_process_in_own_transaction`.
+            self.lock_wait_time += tx_sudo._fintecture_lock_for_processing()
+            context.resolve_records(tx_sudo)
+
+            # Record the transfer before the transaction is updated, so that a repeated notification
+            # is recognized by a single insert
+            tx_sudo._fintecture_record_transfer(context)
+
+            # Handle the notification data to update transaction status, like `_handle_notification_data`
+            # does without looking up the transaction again
+            tx_sudo._process_notification_data(notification_data)
+            tx_sudo._execute_callback()
+
+            # ================================================================
+            # CRITICAL: Post-process transaction
+            # Webhooks don't have user sessions, so we can't use monitor_transaction()
+            # Instead, the post-processing creating account.payment records is scheduled
+            # ================================================================
+            _logger.info("|FintectureWebhookEvent| Updated transaction %s (state: %s) from webhook",
+                       tx_sudo.reference, tx_sudo.state)
+
+            # ================================================================
+            # IMPORTANT: Check for additional payment FIRST (before idempotency check)
+            #
+            # A new transfer recorded in the ledger after a first one is an additional payment.
+            # This check must happen regardless of sale order state
+            # ================================================================
+            is_additional_payment, detection_method, additional_payment_amount = self._detect_additional_payment(
+                context
+            )
+            if is_additional_payment:
+                _logger.info("|FintectureWebhookEvent| Additional payment detected for %s (method: %s, amount: %s)",
+                           tx_sudo.reference, detection_method, additional_payment_amount)
+                try:
+                    tx_sudo._fintecture_handle_additional_payment(context)
+                except Exception as e:
+                    _logger.error("|FintectureWebhookEvent| Error handling additional payment: %s", str(e))
+                    _logger.exception("|FintectureWebhookEvent| Full error:")
+                # Return early - additional payment handled
+                return
+
+            # The accounting (payment creation, reconciliation, sale order confirmation) is left to a
+            # batched cron job, so that it does not hold the processing of the other events
+            if tx_sudo.state == 'done' and not tx_sudo.is_post_processed:
+                _logger.info("|FintectureWebhookEvent| Scheduling the post-processing of transaction %s", tx_sudo.reference)
+                self.env.ref('payment_virementmaitrise.cron_post_process_transactions')._trigger()
+            else:
+                _logger.info("|FintectureWebhookEvent| Transaction %s already post-processed", tx_sudo.reference)
+        else:
+            _logger.info("|FintectureWebhookEvent| Received webhook of payment with session={0}) has the "
+                         " status='{1}' and transfer_state={2}".format(
+                self.session_id,
+                self.status,
+                self.transfer_state
+            ))
+
+    @api.model
+    def _detect_additional_payment(self, context):
+        """ Detect whether the notification reports a payment made after the transaction was paid.
+
+        :param WebhookEventContext context: The context of the notification, with its transfer recorded
+        :return: Whether it is an additional payment, the detection method and the detected amount
+        :rtype: tuple
+        """
+        # A repeated notification, or the first transfer which is handled by the post-processing
+        if not context.is_new_transfer or context.tx.state != 'done' or context.previous_received_amount <= 0:
+            return False, None, 0
+
+        if context.fintecture_transaction_id:
+            detection_method = 'transaction_id'
+        elif context.received_amount:
+            detection_method = 'received_amount'
+        else:
+            detection_method = 'last_transaction_amount'
+        _logger.debug("|FintectureWebhookEvent| Additional payment detected via %s: previous=%s, new=%s",
+                      detection_method, context.previous_received_amount, context.transfer_amount)
+        return True, detection_method, context.transfer_amount
@@ -1,14 +1,17 @@
 import base64
+import hashlib
 import logging
 import unicodedata
 
 from werkzeug.urls import url_join
 
-from odoo import _, api, fields, models, release
+from odoo import _, api, fields, models, release, tools
 from odoo.exceptions import ValidationError, UserError
 
 # Dynamically import from the current module's parent package
 from .. import const
+from .. import sdk_adapter
+from .. import utils as fintecture_utils
 from ..const import CALLBACK_URL, PAYMENT_PROVIDER_NAME, MODULE_NAME, DISPLAY_NAME
 from ..sdk_adapter import fintecture
 
@@ -75,6 +78,23 @@ class PaymentProvider(models.Model):
         string="Include link/QR in invoices",
         default=False
     )
+    fintecture_invoice_link_mode = fields.Selection(
+        string="Invoice payment session",
+        selection=[
+            ('immediate', "Created when the invoice is rendered"),
+            ('deferred', "Created when the customer opens the link"),
+        ],
+        help=f"With deferred creation, invoices link to a stable Odoo page which creates the {DISPLAY_NAME} "
+             f"payment session only when the customer opens it, so rendering invoices makes no API call.",
+        default='immediate',
+        required=True
+    )
+    fintecture_shared_token_store = fields.Boolean(
+        string="Share access token between workers",
+        help="Store the OAuth access token in the database so that all workers and servers reuse it. "
+             "When it expires, a single worker refreshes it while the others wait for the result.",
+        default=False
+    )
     # fintecture_viban_unique_key = fields.Selection(
     #     string="Unique key for virtual IBAN",
     #     selection=[
@@ -182,36 +202,90 @@ class PaymentProvider(models.Model):
     def fintecture_pis_create_request_to_pay(self, lang_code, partner_id, amount, currency_id, reference, state,
                                              due_date=None, expire_date=None):
         _logger.info('|PaymentProvider| Creating the URL for request to pay...')
-        _logger.debug('|PaymentProvider| Input parameters: lang_code=%s, partner_id=%s, amount=%s, currency=%s, reference=%s',
-                      lang_code, partner_id.id if partner_id else None, amount, currency_id.name if currency_id else None, reference)
-        _logger.debug('|PaymentProvider| Provider state: %s', self.state)
-        _logger.debug('|PaymentProvider| PIS App ID: %s', self.fintecture_pis_app_id)
-        _logger.debug('|PaymentProvider| partner_id: %s', partner_id)
+
+        request_values = self._fintecture_prepare_request_to_pay(
+            lang_code, partner_id, amount, currency_id, reference, state, due_date=due_date, expire_date=expire_date
+        )
 
         try:
-            _logger.info('|PaymentProvider| Authenticating with Fintecture PIS...')
-            self._authenticate_in_pis()
-            _logger.info('|PaymentProvider| Authentication successful')
+            _logger.info('|PaymentProvider| Calling fintecture.PIS.request_to_pay...')
+            pay_response = self._fintecture_call(fintecture.PIS.request_to_pay, **request_values)
+            _logger.info('|PaymentProvider| fintecture.PIS.request_to_pay successful')
+            _logger.debug('|PaymentProvider| received request to pay result: {0}'.format(pay_response))
+
+            return pay_response
         except Exception as e:
-            _logger.error('|PaymentProvider| Authentication failed: %s', str(e))
-            _logger.exception('|PaymentProvider| Full authentication error:')
+            _logger.error('|PaymentProvider| fintecture.PIS.request_to_pay failed: %s', str(e))
+            _logger.exception('|PaymentProvider| Full PIS.request_to_pay error:')
             raise
 
-        if due_date is not None and expire_date is not None and due_date >= expire_date:
-            raise ValueError('Due date parameter must be lower than expiry date parameter')
+    def _fintecture_request_to_pay_batch(self, requests_values):
+        """ Send many request-to-pay calls concurrently, authenticating only once.
 
-        # add or subtract two more hours for expire date
-        if due_date is None:
-            if expire_date is not None:
-                due_date = expire_date - 7200
-            else:
-                due_date = 86400 # 1 day
+        Note: self.ensure_one()
 
-        if expire_date is None:
-            if due_date is not None:
-                expire_date = due_date + 7200
-            else:
-                expire_date = 93600
+        :param list requests_values: The keyword arguments of each `fintecture.PIS.request_to_pay`
+                                     call, as returned by `_fintecture_prepare_request_to_pay`
+        :return: The response of each call, or the exception it raised, in the same order
+        :rtype: list
+        """
+        _logger.info('|PaymentProvider| Sending %s requests to pay...', len(requests_values))
+        return self._fintecture_call_batch(fintecture.PIS.request_to_pay, requests_values)
+
+    def _fintecture_call_batch(self, func, calls):
+        """ Call an SDK function many times concurrently, authenticating only once.
+
+        The calls rejected because the access token was revoked meanwhile are retried once with a
+        refreshed token, like `_fintecture_call` does.
+
+        Note: self.ensure_one()
+
+        :param callable func: The SDK function to call
+        :param list calls: The keyword arguments of each call; they must not reference any record
+        :return: The result of each call, or the exception it raised, in the same order
+        :rtype: list
+        :raise: UserError if the OAuth authentication fails
+        """
+        self.ensure_one()
+        if not calls:
+            return []
+
+        client = self._prepare_fintecture_environment()
+        access_token = self._authenticate_in_pis()
+        max_workers = fintecture_utils.get_int_param(self.env, 'batch_max_workers', const.BATCH_MAX_WORKERS)
+
+        results = sdk_adapter.run_concurrently(client, func, calls, max_workers)
+
+        # Refresh the token once and retry the calls rejected because it was revoked meanwhile
+        unauthorized_indexes = [
+            index for index, result in enumerate(results) if sdk_adapter.is_unauthorized_error(result)
+        ]
+        if unauthorized_indexes:
+            self._authenticate_in_pis(stale_token=access_token)
+            retried_results = sdk_adapter.run_concurrently(
+                client, func, [calls[index] for index in unauthorized_indexes], max_workers
+            )
+            for index, result in zip(unauthorized_indexes, retried_results):
+                results[index] = result
+
+        return results
+
+    def _fintecture_prepare_request_to_pay(self, lang_code, partner_id, amount, currency_id, reference, state,
+                                           due_date=None, expire_date=None):
+        """ Build the arguments of a `fintecture.PIS.request_to_pay` call.
+
+        The returned values do not reference any record, so the call can be sent from another thread.
+
+        :return: The keyword arguments of `fintecture.PIS.request_to_pay`
+        :rtype: dict
+        """
+        _logger.debug('|PaymentProvider| Input parameters: lang_code=%s, partner_id=%s, amount=%s, currency=%s, reference=%s',
+                      lang_code, partner_id.id if partner_id else None, amount, currency_id.name if currency_id else None, reference)
+        _logger.debug('|PaymentProvider| Provider state: %s', self.state)
+        _logger.debug('|PaymentProvider| PIS App ID: %s', self.fintecture_pis_app_id)
+        _logger.debug('|PaymentProvider| partner_id: %s', partner_id)
+
+        due_date, expire_date = self._fintecture_get_session_windows(due_date, expire_date)
 
         base_url = self.get_base_url()
         # Fintecture requires HTTPS for redirect_uri
@@ -287,28 +361,46 @@ class PaymentProvider(models.Model):
         _logger.debug('|PaymentProvider| used meta: {0}'.format(meta))
         _logger.debug('|PaymentProvider| used data: {0}'.format(data))
 
-        try:
-            _logger.info('|PaymentProvider| Calling fintecture.PIS.request_to_pay...')
-            pay_response = fintecture.PIS.request_to_pay(
-                redirect_uri=redirect_url,
-                state=state,
-                # ====================================================================
-                # VIBAN API PARAMETER - Currently disabled, keep for future use
-                # Uncomment when VIBAN support is enabled:
-                # with_virtualbeneficiary=True,
-                # ====================================================================
-                meta=meta,
-                data=data,
-                language=lang_code,
-            )
-            _logger.info('|PaymentProvider| fintecture.PIS.request_to_pay successful')
-            _logger.debug('|PaymentProvider| received request to pay result: {0}'.format(pay_response))
+        return {
+            'redirect_uri': redirect_url,
+            'state': state,
+            # ====================================================================
+            # VIBAN API PARAMETER - Currently disabled, keep for future use
+            # Uncomment when VIBAN support is enabled:
+            # 'with_virtualbeneficiary': True,
+            # ====================================================================
+            'meta': meta,
+            'data': data,
+            'language': lang_code,
+        }
 
-            return pay_response
-        except Exception as e:
-            _logger.error('|PaymentProvider| fintecture.PIS.request_to_pay failed: %s', str(e))
-            _logger.exception('|PaymentProvider| Full PIS.request_to_pay error:')
-            raise
+    @api.model
+    def _fintecture_get_session_windows(self, due_date=None, expire_date=None):
+        """ Return the due date and expiry of a payment session, filling the missing ones.
+
+        :param int due_date: The number of seconds until the payment is due, if any
+        :param int expire_date: The number of seconds until the session expires, if any
+        :return: The due date and expiry, in seconds
+        :rtype: tuple
+        :raise: ValueError if the due date is not before the expiry
+        """
+        if due_date is not None and expire_date is not None and due_date >= expire_date:
+            raise ValueError('Due date parameter must be lower than expiry date parameter')
+
+        # add or subtract two more hours for expire date
+        if due_date is None:
+            if expire_date is not None:
+                due_date = expire_date - 7200
+            else:
+                due_date = 86400 # 1 day
+
+        if expire_date is None:
+            if due_date is not None:
+                expire_date = due_date + 7200
+            else:
+                expire_date = 93600
+
+        return due_date, expire_date
 
     def _fintecture_refund_payment(self, session_id, amount, reason=None):
         """ Send a refund request to Fintecture for a payment session.
@@ -322,32 +414,12 @@ class PaymentProvider(models.Model):
         """
         self.ensure_one()
 
-        # Convert amount to string (Fintecture API requires string format)
-        amount_str = str(amount)
-
-        self._authenticate_in_pis()
+        refund_values = self._fintecture_prepare_refund(session_id, amount, reason=reason)
+        _logger.info('|PaymentProvider| Refund data to send: %s', refund_values['data'])
 
         try:
-            # Retrieve the payment session
-            _logger.debug('|PaymentProvider| Retrieving payment session from Fintecture...')
-            session = fintecture.Payment.retrieve(session_id)
-            if not session:
-                raise UserError(_('Payment session %s not found.', session_id))
-
-            _logger.debug('|PaymentProvider| Payment session retrieved successfully')
-            _logger.debug('|PaymentProvider| Session data: %s', session)
-
-            # Prepare refund data
-            refund_data = {
-                'attributes': {
-                    "amount": amount_str,  # Must be string
-                    "communication": reason if reason else f"Refund for {session_id}"
-                }
-            }
-            _logger.info('|PaymentProvider| Refund data to send: %s', refund_data)
-
-            # Execute the refund
-            refund_response = session.refund(data=refund_data)
+            # The session id is known: the session is refunded without being retrieved first
+            refund_response = self._fintecture_call(sdk_adapter.refund_payment_session, **refund_values)
 
             _logger.info('|PaymentProvider| Refund successful for session %s', session_id)
             _logger.debug('|PaymentProvider| Refund response: %s', refund_response)
@@ -361,36 +433,78 @@ class PaymentProvider(models.Model):
             _logger.error('|PaymentProvider| Error type: %s', type(e).__name__)
             _logger.exception('|PaymentProvider| Full refund error traceback:')
 
-            # Extract detailed error message from Fintecture API error
-            error_message = str(e)
-            if hasattr(e, 'json_body') and e.json_body:
-                # Fintecture SDK error with JSON body
-                errors = e.json_body.get('errors', [])
-                if errors and isinstance(errors, list) and len(errors) > 0:
-                    first_error = errors[0]
-                    if isinstance(first_error, dict):
-                        # Use the detailed message from the API
-                        error_message = first_error.get('message', str(e))
-
             raise UserError(_(
                 'Refund failed for Fintecture payment.\n\n'
                 'Session: %s\n'
-                'Error: %s', session_id, error_message
+                'Error: %s', session_id, self._fintecture_get_error_message(e)
             ))
 
+    def _fintecture_refund_payment_batch(self, refunds_values):
+        """ Send many refund requests concurrently, authenticating only once.
+
+        Note: self.ensure_one()
+
+        :param list refunds_values: The keyword arguments of each refund, as returned by
+                                    `_fintecture_prepare_refund`
+        :return: The response of each refund, or the exception it raised, in the same order
+        :rtype: list
+        """
+        _logger.info('|PaymentProvider| Sending %s refund requests...', len(refunds_values))
+        return self._fintecture_call_batch(sdk_adapter.refund_payment_session, refunds_values)
+
+    @api.model
+    def _fintecture_prepare_refund(self, session_id, amount, reason=None):
+        """ Build the arguments of a refund of a payment session.
+
+        :param str session_id: The Fintecture session ID (payment intent) to refund
+        :param float amount: The amount to refund (positive value)
+        :param str reason: Optional reason for the refund
+        :return: The keyword arguments of `sdk_adapter.refund_payment_session`
+        :rtype: dict
+        """
+        return {
+            'session_id': session_id,
+            'data': {
+                'attributes': {
+                    "amount": str(amount),  # Fintecture API requires string format
+                    "communication": reason if reason else f"Refund for {session_id}"
+                }
+            },
+        }
+
+    @api.model
+    def _fintecture_get_error_message(self, error):
+        """ Return the detailed message of an error raised by the SDK.
+
+        :param Exception error: The error raised by an SDK call
+        :return: The message sent by the API, or the error itself
+        :rtype: str
+        """
+        error_message = str(error)
+        if hasattr(error, 'json_body') and error.json_body:
+            # Fintecture SDK error with JSON body
+            errors = error.json_body.get('errors', [])
+            if errors and isinstance(errors, list) and len(errors) > 0:
+                first_error = errors[0]
+                if isinstance(first_error, dict):
+                    # Use the detailed message from the API
+                    error_message = first_error.get('message', str(error))
+        return error_message
+
     def fintecture_webhook_signature(self, payload, digest, signature, request_id):
         _logger.info('|PaymentProvider| Retrieve webhook content and validate signature...')
 
-        self._prepare_fintecture_environment()
+        client = self._prepare_fintecture_environment()
 
-        if not fintecture.private_key:
+        if not client.private_key:
             _logger.error("|PaymentProvider| ignored webhook validation due to undefined private key")
             return False
 
         try:
-            event = fintecture.Webhook.construct_event(
-                payload, digest, signature, request_id
-            )
+            with client.bound():
+                event = fintecture.Webhook.construct_event(
+                    payload, digest, signature, request_id
+                )
         except ValueError as e:
             _logger.error("|PaymentProvider| Error while decoding event. Bad payload!")
             _logger.error("|PaymentProvider| ERROR: %r\n" % e)
@@ -414,6 +528,60 @@ class PaymentProvider(models.Model):
         webhook_path = f'/payment/{self.code}/webhook'
         return url_join(self.get_base_url(), webhook_path)
 
+    # === CRUD METHODS === #
+
+    def write(self, vals):
+        """ Override of `payment` to drop the cached SDK clients and the invoice payment links when
+        the configuration changes. """
+        credential_fields = [field for field in self._fintecture_credential_fields() if field in vals]
+        watched_fields = credential_fields + [
+            field for field in ['fintecture_invoice_link_mode'] if field in vals
+        ]
+        if not watched_fields:
+            return super().write(vals)
+
+        # Writing the same values again must not cancel the sessions which can still be paid
+        old_values = {values['id']: values for values in self.sudo().read(watched_fields)}
+        res = super().write(vals)
+
+        credentials_changed_providers = self.browse()
+        link_mode_changed_providers = self.browse()
+        for provider, new_values in zip(self, self.sudo().read(watched_fields)):
+            changed_fields = {field for field in watched_fields if new_values[field] != old_values[provider.id][field]}
+            if changed_fields.intersection(credential_fields):
+                credentials_changed_providers |= provider
+            elif changed_fields:
+                link_mode_changed_providers |= provider
+
+        for provider in credentials_changed_providers:
+            sdk_adapter.invalidate_client((self.env.cr.dbname, provider.id))
+        if 'account.move' not in self.env:
+            return res
+        # The payment links stored on invoices may point to sessions of the former configuration,
+        # and the draft transactions would otherwise serve these sessions again
+        credentials_changed_providers = credentials_changed_providers.filtered(
+            lambda p: p.code == PAYMENT_PROVIDER_NAME
+        )
+        link_mode_changed_providers = link_mode_changed_providers.filtered(lambda p: p.code == PAYMENT_PROVIDER_NAME)
+        if credentials_changed_providers:
+            self.env['account.move']._fintecture_reset_payment_data(
+                credentials_changed_providers.company_id, cancel_sessions=True
+            )
+        if link_mode_changed_providers:
+            self.env['account.move']._fintecture_reset_payment_data(link_mode_changed_providers.company_id)
+        return res
+
+    @api.model
+    def _fintecture_credential_fields(self):
+        """ Return the fields whose modification invalidates the cached SDK client.
+
+        :return: The field names
+        :rtype: set
+        """
+        return {
+            'state', 'fintecture_pis_app_id', 'fintecture_pis_app_secret', 'fintecture_pis_private_key_file',
+        }
+
     # === BUSINESS METHODS - PAYMENT FLOW === #
 
     def _get_default_payment_method_codes(self):
@@ -426,56 +594,182 @@ class PaymentProvider(models.Model):
     # === BUSINESS METHODS - FINTECTURE ENVIRONMENT === #
 
     def _prepare_fintecture_environment(self):
-        _logger.info('|PaymentProvider| Preparing Fintecture environment...')
+        """ Return the SDK client holding the credentials of this provider.
 
-        if self.state == 'test':
-            fintecture.env = fintecture.environments.ENVIRONMENT_SANDBOX
-        elif self.state == 'enabled':
-            fintecture.env = fintecture.environments.ENVIRONMENT_PRODUCTION
-        else:
-            fintecture.env = fintecture.environments.ENVIRONMENT_TEST
+        Clients are cached per database and provider, and rebuilt when the provider is modified.
+        The client must be bound (see `FintectureClient.bound`) around the SDK calls.
 
-        fintecture.app_id = self.fintecture_pis_app_id
-        fintecture.app_secret = self.fintecture_pis_app_secret
-        if self.fintecture_pis_private_key_file and len(self.fintecture_pis_private_key_file) > 0:
-            try:
-                fintecture.private_key = base64.b64decode(self.fintecture_pis_private_key_file).decode('utf-8')
-            except Exception as e:
-                _logger.error('|PaymentProvider| Error decoding private key certificate: %s', str(e))
+        :return: The client of this provider
+        :rtype: FintectureClient
+        """
+        self.ensure_one()
+        # write_date is the transaction timestamp: also compare the credentials to catch changes
+        # made earlier in the current transaction. The key file is compared by its digest.
+        version = (
+            self.write_date,
+            self.state,
+            self.fintecture_pis_app_id,
+            self.fintecture_pis_app_secret,
+            hashlib.sha256(self.fintecture_pis_private_key_file or b'').hexdigest(),
+        )
+        client = sdk_adapter.get_client(
+            (self.env.cr.dbname, self.id), version, self._fintecture_build_client
+        )
 
         # Set custom app info to identify Odoo plugin in User-Agent
+        sdk_adapter.set_app_info(*self._fintecture_get_app_info())
+
+        return client
+
+    @tools.ormcache()
+    def _fintecture_get_app_info(self):
+        """ Return the name and version identifying the Odoo plugin in the User-Agent.
+
+        The result is cached until the registry is reloaded, which happens when the module is
+        upgraded.
+
+        :return: The application name and version
+        :rtype: tuple
+        """
         module = self.env['ir.module.module'].sudo().search([
             ('name', '=', MODULE_NAME),
             ('state', '=', 'installed')
         ], limit=1)
         plugin_version = module.latest_version if module else 'unknown'
+        return f'Odoo-{MODULE_NAME}', f'{release.version}/{plugin_version}'
 
-        fintecture.set_app_info(
-            f'Odoo-{MODULE_NAME}',
-            version=f'{release.version}/{plugin_version}'
-        )
+    def _fintecture_build_client(self):
+        """ Build a new SDK client from the credentials of this provider.
 
-    def _authenticate_in_pis(self):
-        _logger.info('|PaymentProvider| Authenticating with Fintecture PIS application...')
+        :return: The client
+        :rtype: FintectureClient
+        """
+        _logger.info('|PaymentProvider| Preparing Fintecture environment...')
 
-        self._prepare_fintecture_environment()
+        if self.state == 'test':
+            environment = fintecture.environments.ENVIRONMENT_SANDBOX
+        elif self.state == 'enabled':
+            environment = fintecture.environments.ENVIRONMENT_PRODUCTION
+        else:
+            environment = fintecture.environments.ENVIRONMENT_TEST
 
-        try:
-            oauth_response = fintecture.PIS.oauth()
+        # The key is decoded once per client, not on every call or webhook. It is kept as PEM: the
+        # SDK parses it itself when verifying the webhook signatures.
+        private_key = None
+        if self.fintecture_pis_private_key_file:
+            try:
+                private_key = base64.b64decode(self.fintecture_pis_private_key_file).decode('utf-8')
+            except Exception as e:
+                _logger.error('|PaymentProvider| Error decoding private key certificate: %s', str(e))
 
-            access_token = oauth_response['access_token']
-            expires_in = oauth_response['expires_in']
+        http_client = sdk_adapter.get_http_client(
+            environment,
+            fintecture_utils.get_int_param(self.env, 'http_pool_maxsize', const.HTTP_POOL_MAXSIZE),
+            (
+                fintecture_utils.get_int_param(self.env, 'http_connect_timeout', const.HTTP_CONNECT_TIMEOUT),
+                fintecture_utils.get_int_param(self.env, 'http_read_timeout', const.HTTP_READ_TIMEOUT),
+            ),
+        )
 
-            _logger.debug('|PaymentProvider| _retrieve_pis_access_token(): access_token: {0}'.format(access_token))
-            _logger.debug('|PaymentProvider| _retrieve_pis_access_token(): expires_in: {0}'.format(expires_in))
+        client = sdk_adapter.FintectureClient(
+            (self.env.cr.dbname, self.id),
+            env=environment,
+            app_id=self.fintecture_pis_app_id,
+            app_secret=self.fintecture_pis_app_secret,
+            private_key=private_key,
+            default_http_client=http_client,
+        )
+        return client
 
-            fintecture.access_token = access_token
+    def _authenticate_in_pis(self, stale_token=None):
+        """ Set a valid PIS access token on the client of this provider, reusing the cached one when
+        it is not expired.
 
+        :param str stale_token: A token rejected by the API which must not be reused
+        :return: The access token in use
+        :rtype: str
+        :raise: UserError if the OAuth authentication fails
+        """
+        _logger.info('|PaymentProvider| Authenticating with Fintecture PIS application...')
+
+        client = self._prepare_fintecture_environment()
+
+        try:
+            with client.bound():
+                access_token = sdk_adapter.get_access_token(
+                    self._fintecture_get_token_cache_key(),
+                    lambda: self._fintecture_fetch_access_token(stale_token=stale_token),
+                    stale_token=stale_token,
+                )
         except Exception as e:
             _logger.error('|PaymentProvider| An error occur when trying to authenticate through oAuth...')
             _logger.error('|PaymentProvider| ERROR {0}'.format(str(e)))
             raise UserError(_('Invalid authentication. Check your credential in payment provider configuration page.'))
 
+        client.access_token = access_token
+        return access_token
+
+    def _fintecture_get_token_cache_key(self):
+        """ Return the key identifying the access tokens of this provider in the token cache.
+
+        :return: The cache key
+        :rtype: tuple
+        """
+        self.ensure_one()
+        return self.env.cr.dbname, self.id, self.fintecture_pis_app_id, self.state
+
+    def _fintecture_fetch_access_token(self, stale_token=None):
+        """ Return a new access token for this process, from the shared token store if enabled.
+
+        :param str stale_token: A token rejected by the API which must not be reused
+        :return: The access token and its remaining lifetime in seconds
+        :rtype: tuple
+        """
+        if self.fintecture_shared_token_store:
+            return self.env['fintecture.access.token']._get_shared_access_token(
+                self, self._fintecture_request_access_token, stale_token=stale_token
+            )
+        return self._fintecture_request_access_token()
+
+    def _fintecture_request_access_token(self):
+        """ Request a new access token through the OAuth endpoint.
+
+        Note: the client of this provider must be bound.
+
+        :return: The access token and its lifetime in seconds
+        :rtype: tuple
+        """
+        oauth_response = fintecture.PIS.oauth()
+
+        access_token = oauth_response['access_token']
+        expires_in = oauth_response['expires_in']
+
+        _logger.debug('|PaymentProvider| _retrieve_pis_access_token(): access_token: {0}'.format(access_token))
+        _logger.debug('|PaymentProvider| _retrieve_pis_access_token(): expires_in: {0}'.format(expires_in))
+
+        return access_token, expires_in
+
+    def _fintecture_call(self, func, *args, **kwargs):
+        """ Call an SDK function with a valid access token, refreshing it and retrying once if the
+        API rejects it with an HTTP 401.
+
+        The call runs with the client of this provider bound.
+
+        :param callable func: The SDK function to call
+        :return: The result of the call
+        """
+        client = self._prepare_fintecture_environment()
+        access_token = self._authenticate_in_pis()
+        with client.bound():
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                if not sdk_adapter.is_unauthorized_error(e):
+                    raise
+                _logger.info('|PaymentProvider| Access token rejected by %s, refreshing it and retrying...', DISPLAY_NAME)
+                self._authenticate_in_pis(stale_token=access_token)
+                return func(*args, **kwargs)
+
 
 def normalize_accents(text):
     return unicodedata.normalize('NFKD', text).encode('ASCII', 'ignore').decode('utf-8')
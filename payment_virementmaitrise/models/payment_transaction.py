@@ -2,32 +2,85 @@ import logging
 import pprint
 import uuid
 import qrcode
+import qrcode.image.svg
 import base64
+import hashlib
 import json
+import threading
+import time
 
+from collections import OrderedDict
+from concurrent.futures import Future
 from io import BytesIO
-from datetime import date
+from datetime import date, timedelta
 
 from odoo import SUPERUSER_ID, _, api, fields, models
 from odoo.exceptions import UserError, ValidationError
+from odoo.tools import float_repr
 
 from odoo.addons.payment import utils as payment_utils
 from .. import utils as fintecture_utils
-from ..const import INTENT_STATUS_MAPPING, PAYMENT_PROVIDER_NAME
+from .. import const
+from ..const import INTENT_STATUS_MAPPING, PAYMENT_PROVIDER_NAME, MODULE_NAME
+from ..reconciliation import reconcile_payments_with_invoices
+from ..sdk_adapter import fintecture
 
 _logger = logging.getLogger(__name__)
 
+# Rendered QR codes by hash of their content and rendering options, most recently used last
+_qr_cache = OrderedDict()
+_qr_cache_lock = threading.Lock()
+
+# Payment sessions being requested by this process, as futures by database and transaction id
+_session_requests = {}
+_session_requests_lock = threading.Lock()
+
+# Transaction ids by database and Fintecture session id, most recently used last
+_tx_lookup_cache = OrderedDict()
+_tx_lookup_cache_lock = threading.Lock()
+
 
 class PaymentTransaction(models.Model):
     _inherit = 'payment.transaction'
 
     fintecture_payment_intent = fields.Char(
         string="Fintecture Payment Intent ID",
-        readonly=True
+        readonly=True,
+        index='btree_not_null'
     )
     fintecture_url = fields.Char(
         string="Fintecture URL"
     )
+    fintecture_received_amount = fields.Monetary(
+        string="Fintecture Received Amount",
+        help="The total of the transfers recorded for this transaction",
+        currency_field='currency_id',
+        readonly=True
+    )
+    fintecture_expires_at = fields.Datetime(
+        string="Fintecture Session Expiry",
+        help="When the Fintecture payment session expires",
+        readonly=True,
+        index='btree_not_null'
+    )
+    fintecture_last_status_check = fields.Datetime(
+        string="Fintecture Last Status Check",
+        help="When the status of the session was last fetched from Fintecture, in case its webhook was lost",
+        readonly=True,
+        index=True
+    )
+    fintecture_previous_session_ids = fields.One2many(
+        string="Fintecture Previous Sessions",
+        comodel_name='fintecture.payment.session',
+        inverse_name='transaction_id',
+        readonly=True
+    )
+    fintecture_transfer_ids = fields.One2many(
+        string="Fintecture Transfers",
+        comodel_name='fintecture.transfer',
+        inverse_name='transaction_id',
+        readonly=True
+    )
 
     # ============================================================================
     # VIBAN FIELDS - Currently disabled, keep for future use
@@ -115,7 +168,11 @@ class PaymentTransaction(models.Model):
         if self.provider_code != PAYMENT_PROVIDER_NAME or self.operation != 'online_redirect':
             return res
 
-        if self.fintecture_url and self.provider_reference:
+        # Only the session of a draft transaction is replaced once expired: a pending transaction
+        # may have a transfer in flight on its session, which would then never be matched
+        if self._fintecture_has_valid_session() or (
+            self.state != 'draft' and self.provider_reference and self.fintecture_url
+        ):
             # Transaction already exists, generate redirect form from stored values
             redirect_form_html = f'''
                 <form method="GET" action="{self.fintecture_url}">
@@ -129,6 +186,9 @@ class PaymentTransaction(models.Model):
                 'redirect_form_html': redirect_form_html,
             }
 
+        if self.fintecture_url:
+            _logger.info('|PaymentTransaction| Session of transaction %s expired, creating a new one', self.reference)
+
         try:
             _logger.info('|PaymentTransaction| Creating new payment request...')
             _logger.debug('|PaymentTransaction| provider_code: %s', self.provider_code)
@@ -143,7 +203,7 @@ class PaymentTransaction(models.Model):
             _logger.debug('|PaymentTransaction| state: %s', state)
             _logger.info('|PaymentTransaction| Calling _fintecture_create_request_pay...')
 
-            req_pay_data = self._fintecture_create_request_pay(state)
+            req_pay_data = self._fintecture_create_request_pay_once(state)
             _logger.debug('|PaymentTransaction| req_pay_data: %s', pprint.pformat(req_pay_data))
             req_pay_data = req_pay_data['meta']
         except Exception as e:
@@ -167,6 +227,24 @@ class PaymentTransaction(models.Model):
             'redirect_form_html': redirect_form_html,
         }
 
+    def _fintecture_has_valid_session(self):
+        """ Return whether the stored payment session can still be served to the customer.
+
+        The expiry is checked locally, so that a valid session is served without any API call. A
+        session expiring in less than `const.SESSION_EXPIRY_MARGIN` seconds is considered expired.
+
+        Note: self.ensure_one()
+
+        :return: Whether the session is valid
+        :rtype: bool
+        """
+        self.ensure_one()
+        if not (self.fintecture_url and self.provider_reference):
+            return False
+        return not self.fintecture_expires_at or self.fintecture_expires_at > fields.Datetime.now() + timedelta(
+            seconds=const.SESSION_EXPIRY_MARGIN
+        )
+
     @api.model
     def _get_tx_from_notification_data(self, provider_code, notification_data):
         """ Override of payment to find the transaction based on Fintecture data.
@@ -205,10 +283,7 @@ class PaymentTransaction(models.Model):
                 "Fintecture: " + _("Received data has an invalid structure.")
             )
 
-        found_trx = payment_transaction_model.search([
-            ('provider_code', '=', PAYMENT_PROVIDER_NAME),
-            ('provider_reference', '=', session_id),
-        ], limit=1)
+        found_trx = payment_transaction_model._fintecture_get_tx_by_session(session_id)
         _logger.debug('|PaymentTransaction| found_trx: %r' % found_trx)
         if not found_trx:
             raise ValidationError(
@@ -216,6 +291,79 @@ class PaymentTransaction(models.Model):
             )
         return found_trx
 
+    def write(self, vals):
+        if 'fintecture_payment_intent' in vals or 'provider_reference' in vals:
+            self._fintecture_invalidate_tx_lookup_cache()
+        return super().write(vals)
+
+    def unlink(self):
+        self._fintecture_invalidate_tx_lookup_cache()
+        return super().unlink()
+
+    @api.model
+    def _fintecture_get_tx_by_session(self, session_id):
+        """ Return the Fintecture transaction of a payment session.
+
+        The transaction id is kept in an in-process LRU cache and the transaction is otherwise
+        searched through the index of `fintecture_payment_intent`. A cached id is only trusted if
+        the transaction still exists and holds the session: the cache of the other workers is not
+        invalidated by `write` and `unlink`, and an id cached in a rolled back transaction may not
+        exist. The check reads the transaction row by its primary key.
+
+        :param str session_id: The Fintecture session id
+        :return: The transaction, if found
+        :rtype: recordset of `payment.transaction`
+        """
+        cache_key = (self.env.cr.dbname, session_id)
+        with _tx_lookup_cache_lock:
+            tx_id = _tx_lookup_cache.get(cache_key)
+            if tx_id is not None:
+                _tx_lookup_cache.move_to_end(cache_key)
+
+        if tx_id is not None:
+            tx = self.browse(tx_id).exists()
+            if tx and (tx.fintecture_payment_intent or tx.provider_reference) == session_id:
+                return tx
+            with _tx_lookup_cache_lock:
+                _tx_lookup_cache.pop(cache_key, None)
+
+        tx = self.search([
+            ('fintecture_payment_intent', '=', session_id),
+            ('provider_code', '=', PAYMENT_PROVIDER_NAME),
+        ], limit=1)
+        if not tx:
+            # Transactions whose session id is only stored as provider reference
+            tx = self.search([
+                ('provider_code', '=', PAYMENT_PROVIDER_NAME),
+                ('provider_reference', '=', session_id),
+            ], limit=1)
+            if not tx:
+                # Sessions replaced by a newer one, which can still be paid
+                return self.env['fintecture.payment.session'].sudo().search(
+                    [('session_id', '=', session_id)], limit=1
+                ).transaction_id.with_env(self.env)
+            if tx.fintecture_payment_intent:
+                return tx
+
+        with _tx_lookup_cache_lock:
+            _tx_lookup_cache[cache_key] = tx.id
+            while len(_tx_lookup_cache) > const.TX_LOOKUP_CACHE_SIZE:
+                _tx_lookup_cache.popitem(last=False)
+        return tx
+
+    def _fintecture_invalidate_tx_lookup_cache(self):
+        """ Remove the transactions from the session lookup cache of this worker.
+
+        :return: None
+        """
+        dbname = self.env.cr.dbname
+        tx_ids = set(self.ids)
+        with _tx_lookup_cache_lock:
+            for cache_key in [
+                key for key, tx_id in _tx_lookup_cache.items() if key[0] == dbname and tx_id in tx_ids
+            ]:
+                del _tx_lookup_cache[cache_key]
+
     def _process_notification_data(self, notification_data):
         """ Override of payment to process the transaction based on Fintecture data.
 
@@ -298,126 +446,11 @@ class PaymentTransaction(models.Model):
             _logger.debug('|PaymentTransaction| Fintecture transaction_id: %s, payment_amount: %s (from transaction_amount/received_amount)',
                        fintecture_transaction_id, payment_amount)
 
-            # If transaction is already done and we have a new transaction_id, create additional payment
+            # If transaction is already done and we have a new transaction_id, this is an additional payment
             if self.state == 'done' and fintecture_transaction_id:
-                _logger.debug('|PaymentTransaction| Transaction already done, checking if this is an additional payment')
-
-                # Check if we already processed this transaction_id
-                # Count existing payments (in_process or paid)
-                # Note: In Odoo 18, payment states are 'draft', 'in_process', 'paid', 'cancel' - no 'posted'
-                existing_payments_count = self.env['account.payment'].search_count([
-                    ('payment_transaction_id', '=', self.id),
-                    ('state', 'in', ['in_process', 'paid']),
-                ])
-
-                _logger.debug('|PaymentTransaction| Found %s existing posted payments for this transaction', existing_payments_count)
-
-                # Get invoice linked to this transaction
-                invoices = self.env['account.move'].search([('transaction_ids', 'in', self.id)])
-                if invoices and payment_amount > 0:
-                    invoice = invoices[0]
-                    _logger.debug('|PaymentTransaction| Found invoice %s (id=%s), residual: %s',
-                               invoice.name, invoice.id, invoice.amount_residual)
-
-                    # Create a new payment for this additional transfer
-                    # Get Fintecture payment method line
-                    journal = self.provider_id.journal_id if self.provider_id.journal_id else self.env['account.journal'].search([('type', '=', 'bank')], limit=1)
-                    payment_method_line = self.env['account.payment.method.line'].search([
-                        ('journal_id', '=', journal.id),
-                        ('payment_method_id.code', '=', 'fintecture'),
-                    ], limit=1)
-
-                    _logger.debug('|PaymentTransaction| Using journal: %s, payment method line: %s', journal.name, payment_method_line.name if payment_method_line else 'None')
-
-                    payment_vals = {
-                        'payment_type': 'inbound',
-                        'partner_type': 'customer',
-                        'partner_id': invoice.partner_id.id,
-                        'amount': payment_amount,
-                        'currency_id': invoice.currency_id.id,
-                        'date': fields.Date.context_today(self),
-                        'payment_reference': f'{self.reference} - Payment #{existing_payments_count + 1}',
-                        'journal_id': journal.id,
-                        'payment_method_line_id': payment_method_line.id if payment_method_line else False,
-                        'payment_transaction_id': self.id,
-                        # Link payment to invoice - needed for auto state transition to 'paid'
-                        'invoice_ids': [(4, invoice.id)],  # Many2many link
-                    }
-
-                    _logger.debug('|PaymentTransaction| Creating additional payment with values: %s', payment_vals)
-                    new_payment = self.env['account.payment'].sudo().create(payment_vals)
-                    _logger.debug('|PaymentTransaction| Created payment %s (id=%s)', new_payment, new_payment.id)
-
-                    # Post the payment
-                    new_payment.action_post()
-                    _logger.debug('|PaymentTransaction| Posted additional payment %s', new_payment)
-
-                    # Reconcile with the invoice
-                    # In Odoo 18, payment.line_ids doesn't exist - use payment.move_id.line_ids
-                    # Need to invalidate cache and reload after action_post()
-                    new_payment.invalidate_recordset()
-                    invoice.invalidate_recordset()
-
-                    payment_move = new_payment.move_id
-                    if not payment_move:
-                        _logger.error('|PaymentTransaction| Payment has no move_id after action_post()')
-                    else:
-                        _logger.debug('|PaymentTransaction| Payment move: %s (id=%s)', payment_move.name, payment_move.id)
-
-                        # Get receivable lines from both invoice and payment
-                        invoice_lines = invoice.line_ids.filtered(
-                            lambda l: l.account_id.account_type == 'asset_receivable' and not l.reconciled
-                        )
-                        payment_lines = payment_move.line_ids.filtered(
-                            lambda l: l.account_id.account_type == 'asset_receivable' and not l.reconciled
-                        )
-
-                        _logger.debug('|PaymentTransaction| Invoice receivable lines: %s', invoice_lines.ids)
-                        _logger.debug('|PaymentTransaction| Payment receivable lines: %s', payment_lines.ids)
-
-                        lines_to_reconcile = invoice_lines + payment_lines
-
-                        if len(lines_to_reconcile) >= 2:
-                            _logger.debug('|PaymentTransaction| Reconciling %s lines', len(lines_to_reconcile))
-                            lines_to_reconcile.reconcile()
-
-                            # Refresh records after reconciliation
-                            invoice.invalidate_recordset()
-                            new_payment.invalidate_recordset()
-
-                            _logger.debug('|PaymentTransaction| Reconciled payment with invoice, remaining: %s', invoice.amount_residual)
-
-                            # Trigger payment state update
-                            # Odoo auto-transitions payment to 'paid' when:
-                            # - state == 'in_process'
-                            # - invoice_ids are linked
-                            # - all linked invoices have payment_state == 'paid'
-                            # We need to trigger this check manually after reconciliation
-                            new_payment.invalidate_recordset(['is_reconciled', 'is_matched'])
-                            invoice.invalidate_recordset(['payment_state'])
-
-                            # Force recompute by accessing the fields
-                            _ = new_payment.is_reconciled
-                            _ = invoice.payment_state
-
-                            # If invoice is now fully paid, payment state should auto-transition
-                            if new_payment.state == 'in_process' and invoice.payment_state == 'paid':
-                                _logger.debug('|PaymentTransaction| Invoice fully paid, manually setting payment to paid')
-                                new_payment.write({'state': 'paid'})
-
-                            _logger.debug('|PaymentTransaction| Payment state after reconciliation: %s, is_reconciled: %s, invoice payment_state: %s',
-                                       new_payment.state, new_payment.is_reconciled, invoice.payment_state)
-                        else:
-                            _logger.warning('|PaymentTransaction| Not enough lines to reconcile (need at least 2, found %s)', len(lines_to_reconcile))
-
-                    # Update transaction total amount
-                    total_amount = sum(self.env['account.payment'].search([
-                        ('payment_transaction_id', '=', self.id),
-                        ('state', 'in', ['in_process', 'paid']),
-                    ]).mapped('amount'))
-                    _logger.debug('|PaymentTransaction| Total payments for this transaction: %s', total_amount)
-                else:
-                    _logger.warning('|PaymentTransaction| No invoice found for transaction or invalid amount')
+                # Additional transfers are recorded in the `fintecture.transfer` ledger and their payment
+                # is created by the webhook event processing, see `_fintecture_record_transfer`
+                _logger.debug('|PaymentTransaction| Transaction already done, additional payment handled by the webhook event')
             else:
                 # First payment - standard flow
                 # NOTE: Tokenization is disabled for Fintecture (support_tokenization=False)
@@ -457,6 +490,55 @@ class PaymentTransaction(models.Model):
                 )
             )
 
+    def _fintecture_create_request_pay_once(self, state):
+        """ Create the payment session of the transaction, once for all the concurrent callers.
+
+        The callers of this process wait for the result of the first one, through a map of the
+        pending requests. Those of other processes are serialized by a row lock on the transaction
+        and reuse the session created meanwhile, so that a single session is ever requested.
+
+        Note: self.ensure_one()
+
+        :param str state: The state parameter sent to Fintecture
+        :return: The response of `fintecture.PIS.request_to_pay`, or the stored session in the
+                 same format
+        :rtype: dict
+        """
+        self.ensure_one()
+        key = (self.env.cr.dbname, self.id)
+        with _session_requests_lock:
+            future = _session_requests.get(key)
+            is_first_caller = future is None
+            if is_first_caller:
+                future = _session_requests[key] = Future()
+
+        if not is_first_caller:
+            _logger.info('|PaymentTransaction| Waiting for the payment session of transaction %s being created...',
+                         self.reference)
+            return future.result(timeout=const.SESSION_REQUEST_TIMEOUT)
+
+        try:
+            # Wait for another process creating the session, then read the session it stored
+            self.env.cr.execute(
+                "SELECT id FROM payment_transaction WHERE id = %s FOR NO KEY UPDATE", [self.id]
+            )
+            self.invalidate_recordset([
+                'provider_reference', 'fintecture_payment_intent', 'fintecture_url', 'fintecture_expires_at'
+            ])
+            if self._fintecture_has_valid_session():
+                _logger.info('|PaymentTransaction| Payment session of transaction %s created meanwhile', self.reference)
+                pay_data = {'meta': {'session_id': self.provider_reference, 'url': self.fintecture_url}}
+            else:
+                pay_data = self._fintecture_create_request_pay(state)
+            future.set_result(pay_data)
+            return pay_data
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with _session_requests_lock:
+                _session_requests.pop(key, None)
+
     def _fintecture_create_request_pay(self, state=None):
         _logger.info('|PaymentTransaction| Creating the URL for request to pay...')
 
@@ -468,9 +550,194 @@ class PaymentTransaction(models.Model):
         _logger.debug('|PaymentTransaction| Provider: id=%s, code=%s', self.provider_id.id, self.provider_id.code)
 
         # look for connect invoice to this transaction
-        am = self.env['account.move'].search([('transaction_ids', 'in', self.id)], limit=1)
+        am = self._fintecture_get_invoice_by_tx_id().get(self.id)
         _logger.debug("|PaymentTransaction| _get_specific_processing_values(): am: %s", pprint.pformat(am))
 
+        _logger.info('|PaymentTransaction| Calling provider.fintecture_pis_create_request_to_pay...')
+        arguments = self._fintecture_get_request_pay_arguments(am, state)
+        pay_data = self.provider_id.fintecture_pis_create_request_to_pay(**arguments)
+
+        _logger.info('|PaymentTransaction| Received pay_data from provider')
+        _logger.debug('|PaymentTransaction| pay_data: %s', pprint.pformat(pay_data))
+
+        _due_date, expire = self.provider_id._fintecture_get_session_windows(
+            arguments['due_date'], arguments['expire_date']
+        )
+        self._fintecture_keep_replaced_sessions()
+        self._fintecture_save_request_pay_data(pay_data, expire=expire)
+
+        _logger.info('|PaymentTransaction| Successfully created payment request with session_id: %s',
+                     self.provider_reference)
+        _logger.debug('|PaymentTransaction| pay_data details: %s', pprint.pformat(pay_data))
+        return pay_data
+
+    def _fintecture_create_request_pay_batch(self):
+        """ Create the payment requests of many transactions at once, coalesced with the concurrent
+        requests of the same transactions like `_fintecture_create_request_pay_once` does.
+
+        The transactions whose session is being requested by another caller, of this process or
+        holding their row lock in another one, are skipped rather than waited for. The others are
+        locked and those whose session was replaced meanwhile are not requested again.
+
+        :return: The error message of each transaction whose request failed or was skipped, by
+                 transaction id
+        :rtype: dict
+        """
+        txs = self.filtered(lambda tx: tx.provider_code == PAYMENT_PROVIDER_NAME)
+        if not txs:
+            return {}
+
+        errors = {}
+        futures = {}
+        with _session_requests_lock:
+            for tx in txs:
+                key = (self.env.cr.dbname, tx.id)
+                if key in _session_requests:
+                    errors[tx.id] = _("The payment session is being requested by another process.")
+                else:
+                    futures[tx.id] = _session_requests[key] = Future()
+
+        pay_data_by_tx_id = {}
+        session_by_tx_id = {tx.id: tx.fintecture_payment_intent for tx in txs}
+        try:
+            locked_tx_ids = set()
+            if futures:
+                self.env.cr.execute(
+                    "SELECT id FROM payment_transaction WHERE id IN %s FOR NO KEY UPDATE SKIP LOCKED",
+                    [tuple(futures)]
+                )
+                locked_tx_ids = {row[0] for row in self.env.cr.fetchall()}
+                for tx_id in futures.keys() - locked_tx_ids:
+                    errors[tx_id] = _("The payment session is being requested by another process.")
+
+            locked_txs = txs.filtered(lambda tx: tx.id in locked_tx_ids)
+            locked_txs.invalidate_recordset([
+                'provider_reference', 'fintecture_payment_intent', 'fintecture_url', 'fintecture_expires_at'
+            ])
+            replaced_txs = locked_txs.filtered(
+                lambda tx: tx.fintecture_payment_intent != session_by_tx_id[tx.id] and tx._fintecture_has_valid_session()
+            )
+            for tx in replaced_txs:
+                _logger.info('|PaymentTransaction| Payment session of transaction %s created meanwhile', tx.reference)
+                pay_data_by_tx_id[tx.id] = {'meta': {'session_id': tx.provider_reference, 'url': tx.fintecture_url}}
+
+            sent_pay_data_by_tx_id, send_errors = (locked_txs - replaced_txs)._fintecture_send_request_pay_batch()
+            pay_data_by_tx_id.update(sent_pay_data_by_tx_id)
+            errors.update(send_errors)
+        finally:
+            with _session_requests_lock:
+                for tx_id, future in futures.items():
+                    if tx_id in pay_data_by_tx_id:
+                        future.set_result(pay_data_by_tx_id[tx_id])
+                    else:
+                        future.set_exception(UserError(errors.get(tx_id) or _("The payment request failed.")))
+                    _session_requests.pop((self.env.cr.dbname, tx_id), None)
+
+        for tx_id, error in errors.items():
+            _logger.error('|PaymentTransaction| Payment request failed for transaction %s: %s', tx_id, error)
+        return errors
+
+    def _fintecture_send_request_pay_batch(self):
+        """ Send the payment requests of the transactions and store the resulting sessions.
+
+        The linked invoices are fetched in one query, each provider authenticates once and the
+        requests are sent concurrently. The resulting sessions are written back in one flush.
+
+        :return: The response of each successful request and the error message of each failed
+                 one, by transaction id
+        :rtype: tuple
+        """
+        pay_data_by_tx_id = {}
+        errors = {}
+        if not self:
+            return pay_data_by_tx_id, errors
+
+        _logger.info('|PaymentTransaction| Creating payment requests for %s transactions...', len(self))
+
+        invoice_by_tx_id = self.sudo()._fintecture_get_invoice_by_tx_id()
+
+        for provider, provider_txs in self.grouped('provider_id').items():
+            requests_txs = []
+            requests_values = []
+            for tx in provider_txs:
+                state = '{}/{}'.format(tx.company_id.id, uuid.uuid4().hex)
+                try:
+                    arguments = tx._fintecture_get_request_pay_arguments(invoice_by_tx_id.get(tx.id), state)
+                    requests_values.append(provider._fintecture_prepare_request_to_pay(**arguments))
+                    requests_txs.append(tx)
+                except Exception as e:
+                    errors[tx.id] = str(e)
+
+            try:
+                results = provider._fintecture_request_to_pay_batch(requests_values)
+            except Exception as e:
+                # Authentication failed: none of the requests of this provider could be sent
+                results = [e] * len(requests_txs)
+
+            self.browse(
+                tx.id for tx, pay_data in zip(requests_txs, results) if not isinstance(pay_data, Exception)
+            )._fintecture_keep_replaced_sessions()
+            for tx, request_values, pay_data in zip(requests_txs, requests_values, results):
+                if isinstance(pay_data, Exception):
+                    errors[tx.id] = str(pay_data)
+                else:
+                    tx._fintecture_save_request_pay_data(pay_data, expire=request_values['meta']['expire'])
+                    pay_data_by_tx_id[tx.id] = pay_data
+
+        # The values differ per record but are flushed by the ORM in a single batched UPDATE
+        self.flush_model(['provider_reference', 'fintecture_payment_intent', 'fintecture_url', 'fintecture_expires_at'])
+
+        _logger.info('|PaymentTransaction| Created %s payment requests (%s errors)', len(pay_data_by_tx_id), len(errors))
+        return pay_data_by_tx_id, errors
+
+    def _fintecture_get_invoice_by_tx_id(self):
+        """ Return the primary invoice of each transaction.
+
+        The invoice is read from `fintecture_invoice_id` when the invoice link is loaded, and
+        searched through `invoice_ids` otherwise.
+
+        :return: The invoice of the transactions which have one, by transaction id
+        :rtype: dict
+        """
+        if 'fintecture_invoice_id' in self._fields:
+            return {tx.id: tx.fintecture_invoice_id for tx in self if tx.fintecture_invoice_id}
+
+        invoice_by_tx_id = {}
+        if 'account.move' in self.env:
+            invoices = self.env['account.move'].search([('transaction_ids', 'in', self.ids)])
+            for invoice in invoices:
+                for tx_id in invoice.transaction_ids.ids:
+                    invoice_by_tx_id.setdefault(tx_id, invoice)
+        return invoice_by_tx_id
+
+    def _fintecture_get_sale_order_by_tx_id(self):
+        """ Return the primary sale order of each transaction.
+
+        The sale orders of all the transactions are searched at once through `transaction_ids`.
+
+        :return: The sale order of the transactions which have one, by transaction id
+        :rtype: dict
+        """
+        sale_order_by_tx_id = {}
+        if 'sale.order' in self.env:
+            sale_orders = self.env['sale.order'].search([('transaction_ids', 'in', self.ids)])
+            for sale_order in sale_orders:
+                for tx_id in sale_order.transaction_ids.ids:
+                    sale_order_by_tx_id.setdefault(tx_id, sale_order)
+        return sale_order_by_tx_id
+
+    def _fintecture_get_request_pay_arguments(self, am, state):
+        """ Return the arguments of `fintecture_pis_create_request_to_pay` for this transaction.
+
+        Note: self.ensure_one()
+
+        :param recordset am: The invoice linked to the transaction, as an `account.move` record, or None
+        :param str state: The state parameter sent to Fintecture
+        :return: The keyword arguments
+        :rtype: dict
+        """
+        self.ensure_one()
+
         invoice_due_date = None
         invoice_expire_date = None
         if am:
@@ -496,24 +763,53 @@ class PaymentTransaction(models.Model):
                 lang = ''
                 _logger.debug('|PaymentTransaction| Language defaulted to empty string')
 
-        _logger.info('|PaymentTransaction| Calling provider.fintecture_pis_create_request_to_pay...')
-        pay_data = self.provider_id.fintecture_pis_create_request_to_pay(
-            lang_code=lang,
-            partner_id=self.partner_id,
-            amount=payment_utils.to_minor_currency_units(self.amount, self.currency_id) / 100,
-            currency_id=self.currency_id,
-            reference=self.reference,
-            state=state,
-            due_date=invoice_due_date,
-            expire_date=invoice_expire_date,
-        )
+        return {
+            'lang_code': lang,
+            'partner_id': self.partner_id,
+            'amount': payment_utils.to_minor_currency_units(self.amount, self.currency_id) / 100,
+            'currency_id': self.currency_id,
+            'reference': self.reference,
+            'state': state,
+            'due_date': invoice_due_date,
+            'expire_date': invoice_expire_date,
+        }
 
-        _logger.info('|PaymentTransaction| Received pay_data from provider')
-        _logger.debug('|PaymentTransaction| pay_data: %s', pprint.pformat(pay_data))
+    def _fintecture_keep_replaced_sessions(self):
+        """ Keep the current session of the transactions before they are given a new one.
 
+        The replaced sessions remain payable until they expire: they are recorded with a single
+        insert so that their notifications still find the transaction.
+
+        :return: None
+        """
+        txs = self.filtered('fintecture_payment_intent')
+        if not txs:
+            return
+        self.env.cr.execute("""
+            INSERT INTO fintecture_payment_session (
+                transaction_id, session_id, create_uid, create_date, write_uid, write_date
+            )
+            SELECT tx_id, session_id, %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+              FROM unnest(%(tx_ids)s::int[], %(session_ids)s::varchar[]) AS sessions(tx_id, session_id)
+            ON CONFLICT (session_id) DO NOTHING
+        """, {
+            'tx_ids': txs.ids,
+            'session_ids': txs.mapped('fintecture_payment_intent'),
+            'uid': self.env.uid,
+        })
+        txs.invalidate_recordset(['fintecture_previous_session_ids'])
+
+    def _fintecture_save_request_pay_data(self, pay_data, expire=None):
+        """ Store the session created by a request to pay on the transaction.
+
+        :param dict pay_data: The response of `fintecture.PIS.request_to_pay`
+        :param int expire: The number of seconds until the session expires, if known
+        :return: None
+        """
         self.provider_reference = pay_data['meta']['session_id']
         self.fintecture_payment_intent = pay_data['meta']['session_id']
         self.fintecture_url = pay_data['meta']['url']
+        self.fintecture_expires_at = fields.Datetime.now() + timedelta(seconds=expire) if expire else False
 
         # ========================================================================
         # VIBAN STORAGE - Currently disabled, keep for future use
@@ -521,27 +817,584 @@ class PaymentTransaction(models.Model):
         # if 'virtual_beneficiary' in pay_data:
         #     self.fintecture_virtual_beneficiary = json.dumps(pay_data['virtual_beneficiary'])
 
-        _logger.info('|PaymentTransaction| Successfully created payment request with session_id: %s',
-                     self.provider_reference)
-        _logger.debug('|PaymentTransaction| pay_data details: %s', pprint.pformat(pay_data))
-        return pay_data
-
     def fintecture_create_qr(self):
         self.ensure_one()
+        return self._fintecture_render_qr(self.fintecture_url)
+
+    @api.model
+    def _fintecture_render_qr(self, data):
+        """ Render a QR code encoding the given data, reusing a previous rendering when possible.
+
+        The image format is selected with the system parameter `payment_virementmaitrise.qr_format`,
+        see `const.QR_FORMATS`.
+
+        :param str data: The data to encode, usually a payment URL
+        :return: The base64-encoded image (PNG or SVG)
+        :rtype: bytes
+        """
+        qr_format = self.env['ir.config_parameter'].sudo().get_param(
+            f'{MODULE_NAME}.qr_format', const.QR_DEFAULT_FORMAT
+        )
+        if qr_format not in const.QR_FORMATS:
+            _logger.warning('|PaymentTransaction| Unknown QR code format %s, using %s', qr_format, const.QR_DEFAULT_FORMAT)
+            qr_format = const.QR_DEFAULT_FORMAT
+        options = const.QR_FORMATS[qr_format]
+
+        cache_key = hashlib.sha256(
+            f"{qr_format}|{options['box_size']}|{options['border']}|{data}".encode()
+        ).hexdigest()
+        with _qr_cache_lock:
+            qr_img = _qr_cache.get(cache_key)
+            if qr_img is not None:
+                _qr_cache.move_to_end(cache_key)
+                return qr_img
+
         qr = qrcode.QRCode(
             version=1,
             error_correction=qrcode.constants.ERROR_CORRECT_L,
-            box_size=20,
-            border=4,
+            box_size=options['box_size'],
+            border=options['border'],
         )
-        qr.add_data(self.fintecture_url)
+        qr.add_data(data)
         qr.make(fit=True)
-        img = qr.make_image(fill_color="#000000", back_color="#FFFFFF")
         temp = BytesIO()
-        img.save(temp, format="PNG")
+        if qr_format == 'svg':
+            img = qr.make_image(image_factory=qrcode.image.svg.SvgPathImage)
+            img.save(temp)
+        else:
+            img = qr.make_image(fill_color="#000000", back_color="#FFFFFF")
+            img.save(temp, format="PNG")
         qr_img = base64.b64encode(temp.getvalue())
+
+        with _qr_cache_lock:
+            _qr_cache[cache_key] = qr_img
+            while len(_qr_cache) > const.QR_CACHE_SIZE:
+                _qr_cache.popitem(last=False)
         return qr_img
 
+    @api.model
+    def _fintecture_get_qr_mimetype(self, qr_img):
+        """ Return the mimetype of a QR code rendered by `_fintecture_render_qr`.
+
+        :param bytes qr_img: The base64-encoded image
+        :return: The mimetype
+        :rtype: str
+        """
+        # base64 of b'<?xml' and b'<svg'
+        if qr_img and qr_img[:6] in (b'PD94bW', b'PHN2Zy'):
+            return 'image/svg+xml'
+        return 'image/png'
+
+    def _post_process(self):
+        """ Override of `payment` to reconcile the payments of the Fintecture transactions with their
+        invoice.
+
+        The invoices and payments of all the transactions are fetched together and reconciled in
+        one batch.
+        """
+        super()._post_process()
+
+        txs = self.filtered(lambda tx: tx.provider_code == PAYMENT_PROVIDER_NAME and tx.state == 'done')
+        if not txs or 'account.move' not in self.env:
+            return
+
+        invoice_by_tx_id = txs.sudo()._fintecture_get_invoice_by_tx_id()
+
+        # Find the payments created by the post-processing
+        payments = self.env['account.payment'].sudo().search([
+            ('payment_transaction_id', 'in', txs.ids),
+            ('state', 'in', ['posted', 'in_process']),
+        ])
+        reconcile_payments_with_invoices(payments.env, [
+            (payment, invoice_by_tx_id.get(payment.payment_transaction_id.id)) for payment in payments
+        ])
+
+    @api.model
+    def _cron_fintecture_post_process(self):
+        """ Post-process a batch of the done Fintecture transactions, away from the webhook processing.
+
+        The transactions are post-processed together per company and journal. When a group fails,
+        its transactions are post-processed one by one so that a failing transaction does not block
+        the others. The batch size is set with the system parameter
+        `payment_virementmaitrise.post_process_batch_size`.
+        """
+        batch_size = fintecture_utils.get_int_param(
+            self.env, 'post_process_batch_size', const.POST_PROCESS_BATCH_SIZE
+        )
+        # Like the `payment` post-processing cron, give up on transactions failing for days
+        domain = [
+            ('provider_code', '=', PAYMENT_PROVIDER_NAME),
+            ('state', '=', 'done'),
+            ('is_post_processed', '=', False),
+            ('last_state_change', '>=', fields.Datetime.now() - timedelta(days=4)),
+        ]
+        txs = self.sudo().search(domain, order='last_state_change, id', limit=batch_size)
+        _logger.info('|PaymentTransaction| Post-processing %s done transactions...', len(txs))
+
+        processed = 0
+        for (company, _journal), group_txs in txs.grouped(
+            lambda tx: (tx.company_id, tx.provider_id.journal_id)
+        ).items():
+            group_txs = group_txs.with_company(company)
+            try:
+                with self.env.cr.savepoint():
+                    group_txs._post_process()
+                processed += len(group_txs)
+                continue
+            except Exception as e:
+                _logger.warning('|PaymentTransaction| Post-processing of %s transactions failed, retrying one by one: %s',
+                                len(group_txs), str(e))
+
+            for tx in group_txs:
+                try:
+                    with self.env.cr.savepoint():
+                        tx._post_process()
+                    processed += 1
+                except Exception as e:
+                    _logger.error('|PaymentTransaction| Error post-processing transaction %s: %s', tx.reference, str(e))
+                    _logger.exception('|PaymentTransaction| Full exception:')
+
+        # Stop until the next scheduled run when only failing transactions are left
+        remaining = self.sudo().search_count(domain) if processed else 0
+        self.env['ir.cron']._notify_progress(done=processed, remaining=remaining)
+
+    @api.model
+    def _cron_fintecture_poll_status(self):
+        """ Fetch the session status of the stale draft and pending Fintecture transactions, in case
+        their webhook was lost.
+
+        The sessions are retrieved concurrently with one authentication per provider, at most
+        `payment_virementmaitrise.status_poll_rate_limit` per second, and until the run has spent
+        `payment_virementmaitrise.status_poll_time_budget` seconds. The transactions without
+        notification for `payment_virementmaitrise.status_poll_interval` minutes are fetched, the
+        least recently checked first. Each chunk is committed before waiting for the next one.
+        """
+        batch_size = fintecture_utils.get_int_param(
+            self.env, 'status_poll_batch_size', const.STATUS_POLL_BATCH_SIZE
+        )
+        rate_limit = max(1, fintecture_utils.get_int_param(
+            self.env, 'status_poll_rate_limit', const.STATUS_POLL_RATE_LIMIT
+        ))
+        time_budget = fintecture_utils.get_int_param(
+            self.env, 'status_poll_time_budget', const.STATUS_POLL_TIME_BUDGET
+        )
+        interval = fintecture_utils.get_int_param(self.env, 'status_poll_interval', const.STATUS_POLL_INTERVAL)
+        stale_date = fields.Datetime.now() - timedelta(minutes=interval)
+        domain = [
+            ('provider_code', '=', PAYMENT_PROVIDER_NAME),
+            ('operation', '=', 'online_redirect'),
+            ('state', 'in', ['draft', 'pending']),
+            ('fintecture_payment_intent', '!=', False),
+            ('last_state_change', '<=', stale_date),
+            '|',
+            ('fintecture_last_status_check', '=', False),
+            ('fintecture_last_status_check', '<=', stale_date),
+        ]
+        txs = self.sudo().search(domain, order='fintecture_last_status_check asc nulls first, id', limit=batch_size)
+        _logger.info('|PaymentTransaction| Fetching the session status of %s stale transactions...', len(txs))
+
+        deadline = time.monotonic() + time_budget
+        checked = 0
+        # Outside of tests, each chunk is committed so that the polled transactions are not kept
+        # locked, from the webhook processing and the checkout, until the end of the run
+        auto_commit = fintecture_utils.can_commit()
+        for provider, provider_txs in txs.grouped('provider_id').items():
+            for index in range(0, len(provider_txs), rate_limit):
+                if time.monotonic() >= deadline:
+                    break
+                chunk_start = time.monotonic()
+                chunk_txs = provider_txs[index:index + rate_limit]
+                try:
+                    sessions = provider._fintecture_call_batch(fintecture.Payment.retrieve, [
+                        {'id': tx.fintecture_payment_intent} for tx in chunk_txs
+                    ])
+                except Exception as e:
+                    _logger.error('|PaymentTransaction| Cannot fetch the sessions of provider %s: %s', provider.id, str(e))
+                    break
+
+                for tx, session in zip(chunk_txs, sessions):
+                    if isinstance(session, Exception):
+                        _logger.warning('|PaymentTransaction| Cannot fetch session %s: %s',
+                                        tx.fintecture_payment_intent, str(session))
+                        continue
+                    try:
+                        with self.env.cr.savepoint():
+                            tx._fintecture_apply_session_status(session)
+                    except Exception as e:
+                        _logger.error('|PaymentTransaction| Error applying the status of session %s: %s',
+                                      tx.fintecture_payment_intent, str(e))
+                chunk_txs.write({'fintecture_last_status_check': fields.Datetime.now()})
+                checked += len(chunk_txs)
+                if auto_commit:
+                    self.env.cr.commit()
+
+                # Spread the calls so that at most `rate_limit` are sent per second
+                elapsed = time.monotonic() - chunk_start
+                if elapsed < 1 and index + rate_limit < len(provider_txs):
+                    time.sleep(1 - elapsed)
+
+        _logger.info('|PaymentTransaction| Fetched the session status of %s transactions', checked)
+        remaining = self.sudo().search_count(domain) if checked else 0
+        self.env['ir.cron']._notify_progress(done=checked, remaining=remaining)
+
+    @api.model
+    def _cron_fintecture_cancel_expired_sessions(self):
+        """ Cancel a chunk of the transactions whose Fintecture payment session has expired.
+
+        The draft transactions are canceled as soon as their session expires, the pending ones only
+        `payment_virementmaitrise.expired_session_grace_days` days later since the transfer may
+        still be received. The chunk size is set with the system parameter
+        `payment_virementmaitrise.expired_session_batch_size`.
+        """
+        batch_size = fintecture_utils.get_int_param(
+            self.env, 'expired_session_batch_size', const.EXPIRED_SESSION_BATCH_SIZE
+        )
+        grace_days = fintecture_utils.get_int_param(
+            self.env, 'expired_session_grace_days', const.EXPIRED_SESSION_GRACE_DAYS
+        )
+        now = fields.Datetime.now()
+        domain = [
+            ('provider_code', '=', PAYMENT_PROVIDER_NAME),
+            ('fintecture_expires_at', '!=', False),
+            '|',
+            '&', ('state', '=', 'draft'), ('fintecture_expires_at', '<=', now),
+            '&', ('state', '=', 'pending'), ('fintecture_expires_at', '<=', now - timedelta(days=grace_days)),
+        ]
+        txs = self.sudo().search(domain, order='fintecture_expires_at, id', limit=batch_size)
+        if txs:
+            # The states are updated with a single write for the whole chunk
+            txs._set_canceled(state_message=_("The Fintecture payment session has expired."))
+            _logger.info('|PaymentTransaction| Canceled %s transactions with an expired session', len(txs))
+
+        remaining = self.sudo().search_count(domain) if txs else 0
+        self.env['ir.cron']._notify_progress(done=len(txs), remaining=remaining)
+
+    @api.model
+    def _cron_fintecture_refresh_expiring_sessions(self):
+        """ Replace the payment sessions of the open invoices before they expire.
+
+        The sessions expiring in less than `payment_virementmaitrise.session_refresh_lead_hours`
+        hours are requested again in batch, and the payment link and QR code of their invoice are
+        updated, so that the customer never opens a dead link. A session which cannot be replaced
+        is kept until it expires. The replaced sessions, still printed on the invoices sent
+        before, can be paid until they expire and keep matching the transaction, see
+        `_fintecture_keep_replaced_sessions`.
+        """
+        if 'fintecture_invoice_id' not in self._fields:
+            self.env['ir.cron']._notify_progress(done=0, remaining=0)
+            return
+
+        batch_size = fintecture_utils.get_int_param(
+            self.env, 'session_refresh_batch_size', const.SESSION_REFRESH_BATCH_SIZE
+        )
+        lead_hours = fintecture_utils.get_int_param(
+            self.env, 'session_refresh_lead_hours', const.SESSION_REFRESH_LEAD_HOURS
+        )
+        now = fields.Datetime.now()
+        domain = [
+            ('provider_code', '=', PAYMENT_PROVIDER_NAME),
+            ('state', '=', 'draft'),
+            ('fintecture_expires_at', '>', now),
+            ('fintecture_expires_at', '<=', now + timedelta(hours=lead_hours)),
+            ('fintecture_invoice_id.state', '=', 'posted'),
+            ('fintecture_invoice_id.payment_state', 'in', ['not_paid', 'partial']),
+        ]
+        txs = self.sudo().search(domain, order='fintecture_expires_at, id', limit=batch_size)
+        _logger.info('|PaymentTransaction| Refreshing %s payment sessions close to expiry...', len(txs))
+
+        # A session is never requested again for values the invoice no longer has, the transaction
+        # is replaced when the invoice payment data is materialized again
+        outdated_txs = txs.filtered(lambda tx: tx.fintecture_invoice_id._fintecture_is_transaction_outdated(tx))
+        outdated_txs._set_canceled(state_message=_("The invoice changed since the payment session was requested."))
+        txs -= outdated_txs
+
+        old_url_by_tx_id = {tx.id: tx.fintecture_url for tx in txs}
+        errors = txs._fintecture_create_request_pay_batch()
+        refreshed_txs = txs.filtered(lambda tx: tx.id not in errors)
+        for tx in refreshed_txs:
+            invoice = tx.fintecture_invoice_id
+            # Only the links pointing to the session are replaced, the deferred links stay valid
+            if invoice.fintecture_payment_link == old_url_by_tx_id[tx.id]:
+                invoice.write({
+                    'fintecture_payment_link': tx.fintecture_url,
+                    'fintecture_payment_qr': tx.fintecture_create_qr(),
+                })
+
+        remaining = self.sudo().search_count(domain) if refreshed_txs or outdated_txs else 0
+        self.env['ir.cron']._notify_progress(done=len(refreshed_txs), remaining=remaining)
+
+    def _fintecture_apply_session_status(self, session):
+        """ Update the transaction from its session, as retrieved from Fintecture.
+
+        The paid sessions are queued as webhook events, so that their transfer is recorded and the
+        transaction is updated and post-processed exactly like when the webhook is received; a
+        webhook received meanwhile is skipped as duplicate. The other known statuses are applied
+        with `_process_notification_data`, and the unknown ones left for a later check.
+
+        Note: self.ensure_one()
+
+        :param dict session: The response of `fintecture.Payment.retrieve`
+        :return: None
+        """
+        self.ensure_one()
+        notification_data = self._fintecture_get_notification_data_from_session(session)
+        status = notification_data['status']
+        transfer_state = notification_data['transfer_state']
+
+        if status in const.WEBHOOK_PROCESSED_STATUSES and transfer_state in const.WEBHOOK_PROCESSED_TRANSFER_STATES:
+            self.env['fintecture.webhook.event']._enqueue(self.provider_id, notification_data, notification_data, {})
+            return
+
+        known_statuses = {value for values in INTENT_STATUS_MAPPING.values() for value in values}
+        if status not in known_statuses and transfer_state not in known_statuses:
+            _logger.debug('|PaymentTransaction| Session %s has no known status yet (status=%s, transfer_state=%s)',
+                          self.fintecture_payment_intent, status, transfer_state)
+            return
+
+        # Leave the transactions being processed from a webhook to it, instead of waiting for them,
+        # so that the polling run never takes part in a deadlock
+        if not self._fintecture_try_lock_for_processing():
+            _logger.info('|PaymentTransaction| Transaction %s is being processed, skipping its polled status',
+                         self.reference)
+            return
+        self._process_notification_data(notification_data)
+
+    def _fintecture_get_notification_data_from_session(self, session):
+        """ Return the values of a retrieved session in the format of the webhook notifications.
+
+        Note: self.ensure_one()
+
+        :param dict session: The response of `fintecture.Payment.retrieve`
+        :return: The notification data
+        :rtype: dict
+        """
+        self.ensure_one()
+        meta = session.get('meta') or {}
+        attributes = (session.get('data') or {}).get('attributes') or {}
+        notification_data = {
+            'session_id': meta.get('session_id') or self.fintecture_payment_intent,
+            'status': meta.get('status') or attributes.get('status'),
+            'transfer_state': meta.get('transfer_state') or attributes.get('transfer_state'),
+        }
+        for key in ('received_amount', 'transaction_id'):
+            value = meta.get(key) or attributes.get(key)
+            if value:
+                notification_data[key] = str(value)
+        return notification_data
+
+    def _fintecture_try_lock_for_processing(self):
+        """ Take the processing lock of the transaction if no other database transaction holds it.
+
+        Note: self.ensure_one()
+
+        :return: Whether the lock was taken; it is then held until the end of the current database
+                 transaction
+        :rtype: bool
+        """
+        self.ensure_one()
+        self.env.cr.execute(
+            "SELECT pg_try_advisory_xact_lock(%s, %s)", [const.WEBHOOK_LOCK_NAMESPACE, self.id]
+        )
+        return self.env.cr.fetchone()[0]
+
+    def _fintecture_lock_for_processing(self):
+        """ Wait until no other database transaction is processing a notification of this transaction.
+
+        The lock is a transaction-level advisory lock, released at the end of the current database
+        transaction, which costs no row lock and does not conflict with other transactions.
+
+        Note: self.ensure_one()
+
+        :return: The time spent waiting for the lock, in milliseconds
+        :rtype: float
+        """
+        self.ensure_one()
+        start = time.monotonic()
+        self.env.cr.execute(
+            "SELECT pg_advisory_xact_lock(%s, %s)", [const.WEBHOOK_LOCK_NAMESPACE, self.id]
+        )
+        wait_time = (time.monotonic() - start) * 1000
+        if wait_time > const.WEBHOOK_LOCK_WAIT_LOG_THRESHOLD:
+            _logger.info('|PaymentTransaction| Waited %.0f ms for the processing lock of transaction %s',
+                         wait_time, self.reference)
+        return wait_time
+
+    def _fintecture_record_transfer(self, context):
+        """ Record the transfer notified by the context in the ledger, unless it is already known.
+
+        The transfer is identified by its Fintecture transaction id or, for the transfers notified
+        without one, by the session and the total received, computed from the amount of the last
+        transfer when the notification only gives it. The amount and the previous total are stored
+        on the context for the next processing stages.
+
+        Note: self.ensure_one()
+
+        :param WebhookEventContext context: The context of the notification, with its records resolved
+        :return: Whether the transfer is new
+        :rtype: bool
+        """
+        self.ensure_one()
+        # The payments of the transactions paid before the ledger existed stand for their transfers
+        previous_total = self.fintecture_received_amount or context.total_existing_amount
+
+        transfer_key = context.fintecture_transaction_id
+        if not transfer_key:
+            received_amount = context.received_amount
+            if not received_amount and context.last_transaction_amount:
+                received_amount = previous_total + context.last_transaction_amount
+            if received_amount:
+                # Rounded to the currency, so that a total notified and the same total computed from
+                # the amount of the last transfer give the same key
+                transfer_key = '{}/{}'.format(
+                    context.session_id,
+                    float_repr(self.currency_id.round(received_amount), self.currency_id.decimal_places),
+                )
+        if not transfer_key:
+            _logger.debug('|PaymentTransaction| Notification of %s does not identify a transfer', self.reference)
+            return False
+
+        amount = (
+            context.last_transaction_amount
+            or context.transaction_amount
+            or (context.received_amount or 0) - previous_total
+        )
+
+        self.env.cr.execute("""
+            INSERT INTO fintecture_transfer (
+                transaction_id, fintecture_transaction_id, amount, received_amount,
+                create_uid, create_date, write_uid, write_date
+            )
+            VALUES (
+                %(transaction_id)s, %(transfer_key)s, %(amount)s, %(received_amount)s,
+                %(uid)s, NOW() AT TIME ZONE 'UTC', %(uid)s, NOW() AT TIME ZONE 'UTC'
+            )
+            ON CONFLICT (fintecture_transaction_id) DO NOTHING
+            RETURNING id
+        """, {
+            'transaction_id': self.id,
+            'transfer_key': transfer_key,
+            'amount': amount,
+            'received_amount': previous_total + amount,
+            'uid': self.env.uid,
+        })
+        if not self.env.cr.fetchone():
+            _logger.info('|PaymentTransaction| Transfer %s of %s already recorded', transfer_key, self.reference)
+            return False
+
+        self.fintecture_received_amount = previous_total + amount
+        self.invalidate_recordset(['fintecture_transfer_ids'])
+        context.is_new_transfer = True
+        context.transfer_amount = amount
+        context.previous_received_amount = previous_total
+        _logger.info('|PaymentTransaction| Recorded transfer %s of %s for %s (received: %s)',
+                     transfer_key, amount, self.reference, previous_total + amount)
+        return True
+
+    def _fintecture_handle_additional_payment(self, context):
+        """Handle additional partial payment for an already-paid transaction.
+
+        When a user makes multiple payments for one order, Fintecture sends multiple webhooks.
+        This method creates additional payment records.
+
+        The payment amount is the one of the transfer recorded by `_fintecture_record_transfer`.
+
+        Note: self.ensure_one()
+
+        :param WebhookEventContext context: The context of the notification, with its records resolved
+        """
+        self.ensure_one()
+
+        # The amount of the transfer, as recorded in the ledger
+        payment_amount = context.transfer_amount
+        total_existing_amount = context.previous_received_amount
+
+        if payment_amount <= 0:
+            _logger.warning('|PaymentTransaction| Invalid payment amount: %s', payment_amount)
+            return
+
+        _logger.info('|PaymentTransaction| Creating additional payment of %s EUR for %s (existing: %s EUR)',
+                   payment_amount, self.reference, total_existing_amount)
+
+        # Count existing payments
+        existing_payments_count = len(context.existing_payments)
+
+        # Get invoice linked to this transaction (if exists)
+        # For eCommerce orders, invoice might not exist yet - we'll create standalone payment
+        invoice = context.invoice
+
+        if invoice:
+            _logger.debug('|PaymentTransaction| Invoice %s found, will reconcile immediately', invoice.name)
+            partner_id = invoice.partner_id.id
+            currency_id = invoice.currency_id.id
+        else:
+            # No invoice yet (eCommerce scenario) - use transaction's partner and currency
+            _logger.debug('|PaymentTransaction| No invoice - creating standalone payment for later reconciliation')
+            partner_id = self.partner_id.id
+            currency_id = self.currency_id.id
+
+        # Get journal and payment method
+        journal = self.provider_id.journal_id if self.provider_id.journal_id else self.env['account.journal'].sudo().search([('type', '=', 'bank')], limit=1)
+
+        # Get Fintecture payment method line for this journal
+        payment_method_line = self.env['account.payment.method.line'].sudo().search([
+            ('journal_id', '=', journal.id),
+            ('payment_method_id.code', '=', PAYMENT_PROVIDER_NAME),
+        ], limit=1)
+
+        if not payment_method_line:
+            _logger.error('|PaymentTransaction| No Fintecture payment method line found for journal %s', journal.name if journal else 'None')
+            return
+
+        # Create payment
+        payment_vals = {
+            'payment_type': 'inbound',
+            'partner_type': 'customer',
+            'partner_id': partner_id,
+            'amount': payment_amount,
+            'currency_id': currency_id,
+            'date': fields.Date.context_today(self),
+            'payment_reference': f'{self.reference} - Payment #{existing_payments_count + 1}',
+            'journal_id': journal.id,
+            'payment_method_line_id': payment_method_line.id if payment_method_line else False,
+            'payment_transaction_id': self.id,
+        }
+
+        new_payment = self.env['account.payment'].sudo().create(payment_vals)
+        new_payment.action_post()
+        _logger.info('|PaymentTransaction| Created additional payment %s (%s EUR)',
+                     new_payment.name, new_payment.amount)
+
+        # Reconcile with invoice (if invoice exists)
+        if invoice:
+            reconcile_payments_with_invoices(self.env, [(new_payment, invoice)])
+            _logger.info('|PaymentTransaction| Reconciled payment %s with invoice %s (state: %s)',
+                       new_payment.name, invoice.name, new_payment.state)
+
+        # Check if order should be confirmed based on webhook data
+        # Fintecture sends status=payment_created when full payment is received
+        # received_amount gives the TOTAL amount received across all partial payments
+        webhook_status = context.status
+        received_amount = context.received_amount or 0
+
+        # Find sale order linked to this transaction
+        sale_order = context.sale_order
+
+        if sale_order and sale_order.state in ['draft', 'sent']:
+            # Confirm order if status=payment_created (full payment received)
+            # OR if received_amount covers the order amount
+            should_confirm = (
+                webhook_status == 'payment_created' or
+                received_amount >= self.amount
+            )
+
+            if should_confirm:
+                try:
+                    sale_order.action_confirm()
+                    _logger.info('|PaymentTransaction| Sale order %s confirmed (full payment received: %s EUR)',
+                                 sale_order.name, received_amount)
+                except Exception as e:
+                    _logger.warning('|PaymentTransaction| Failed to confirm sale order %s: %s', sale_order.name, str(e))
+
     def _send_refund_request(self, amount_to_refund=None):
         """ Override of payment to send a refund request to Fintecture.
 
@@ -593,3 +1446,134 @@ class PaymentTransaction(models.Model):
         )
 
         return refund_tx
+
+    def _fintecture_send_refund_requests(self, amount_by_tx_id=None):
+        """ Refund many Fintecture transactions at once.
+
+        The refund transactions are created with a single `create`, each provider authenticates
+        once and the sessions are refunded concurrently, without being retrieved first. A failing
+        refund does not prevent the others from being sent: its refund transaction is set in error.
+
+        :param dict amount_by_tx_id: The amount to refund of each transaction, by transaction id;
+                                     the remaining amount of the transactions which are not listed
+                                     is refunded
+        :return: The refund transactions, and the error message of each failed refund by source
+                 transaction id
+        :rtype: tuple
+        :raise: UserError if an amount to refund is not positive or exceeds the refundable amount
+        """
+        amount_by_tx_id = amount_by_tx_id or {}
+        txs = self.filtered(
+            lambda tx: tx.provider_code == PAYMENT_PROVIDER_NAME and tx.state == 'done' and tx.provider_reference
+        )
+
+        # All the amounts are checked before any refund transaction is created or request sent
+        amount_to_refund_by_tx = {}
+        for tx in txs:
+            refundable_amount = tx._fintecture_get_refundable_amount()
+            if tx.id not in amount_by_tx_id:
+                if tx.currency_id.compare_amounts(refundable_amount, 0) > 0:
+                    amount_to_refund_by_tx[tx] = refundable_amount
+                else:
+                    _logger.info('|PaymentTransaction| Transaction %s is already fully refunded', tx.reference)
+                continue
+
+            amount = amount_by_tx_id[tx.id]
+            if (
+                tx.currency_id.compare_amounts(amount, 0) <= 0
+                or tx.currency_id.compare_amounts(amount, refundable_amount) > 0
+            ):
+                raise UserError(_(
+                    "The amount to refund of transaction %(reference)s must be positive and at most %(amount)s.",
+                    reference=tx.reference, amount=refundable_amount,
+                ))
+            amount_to_refund_by_tx[tx] = amount
+
+        if not amount_to_refund_by_tx:
+            return self.browse(), {}
+        txs = self.browse(tx.id for tx in amount_to_refund_by_tx)
+
+        _logger.info('|PaymentTransaction| Sending refund requests for %s transactions...', len(txs))
+        refund_txs = self.create([
+            tx._fintecture_prepare_refund_transaction_values(amount)
+            for tx, amount in amount_to_refund_by_tx.items()
+        ])
+        refund_tx_by_tx_id = {refund_tx.source_transaction_id.id: refund_tx for refund_tx in refund_txs}
+
+        errors = {}
+        done_refund_txs = self.browse()
+        for provider, provider_txs in txs.grouped('provider_id').items():
+            refunds_values = [
+                provider._fintecture_prepare_refund(
+                    tx.provider_reference, abs(refund_tx_by_tx_id[tx.id].amount), reason=f"Refund {tx.reference}"
+                )
+                for tx in provider_txs
+            ]
+            try:
+                results = provider._fintecture_refund_payment_batch(refunds_values)
+            except Exception as e:
+                # Authentication failed: none of the refunds of this provider could be sent
+                results = [e] * len(provider_txs)
+
+            for tx, refund_data in zip(provider_txs, results):
+                refund_tx = refund_tx_by_tx_id[tx.id]
+                if isinstance(refund_data, Exception):
+                    errors[tx.id] = provider._fintecture_get_error_message(refund_data)
+                    refund_tx._set_error("Fintecture: " + _("Refund failed: %s", errors[tx.id]))
+                    continue
+
+                if refund_data and isinstance(refund_data, dict):
+                    refund_id = refund_data.get('id') or refund_data.get('meta', {}).get('session_id')
+                    if refund_id:
+                        refund_tx.provider_reference = refund_id
+                done_refund_txs |= refund_tx
+
+        # Fintecture processes refunds immediately
+        if done_refund_txs:
+            done_refund_txs._set_done()
+            self.env.ref('payment.cron_post_process_payment_tx')._trigger()
+
+        for tx_id, error in errors.items():
+            _logger.error('|PaymentTransaction| Refund failed for transaction %s: %s', tx_id, error)
+        _logger.info('|PaymentTransaction| Sent %s refunds (%s errors)', len(done_refund_txs), len(errors))
+        return refund_txs, errors
+
+    def _fintecture_get_refundable_amount(self):
+        """ Return the amount of this transaction which has not been refunded yet.
+
+        The failed and canceled refunds are not deduced.
+
+        Note: self.ensure_one()
+
+        :return: The refundable amount
+        :rtype: float
+        """
+        self.ensure_one()
+        refund_txs = self.child_transaction_ids.filtered(
+            lambda child: child.operation == 'refund' and child.state not in ('cancel', 'error')
+        )
+        # The amounts of the refund transactions are negative
+        return self.amount + sum(refund_txs.mapped('amount'))
+
+    def _fintecture_prepare_refund_transaction_values(self, amount):
+        """ Return the values of the refund transaction of this transaction, like
+        `_create_child_transaction` does.
+
+        Note: self.ensure_one()
+
+        :param float amount: The amount to refund (positive value)
+        :return: The values of the refund transaction
+        :rtype: dict
+        """
+        self.ensure_one()
+        return {
+            'provider_id': self.provider_id.id,
+            'payment_method_id': self.payment_method_id.id,
+            'reference': self._compute_reference(self.provider_code, prefix=f'R-{self.reference}'),
+            'amount': -amount,
+            'currency_id': self.currency_id.id,
+            'token_id': self.token_id.id,
+            'operation': 'refund',
+            'source_transaction_id': self.id,
+            'partner_id': self.partner_id.id,
+        }
@@ -0,0 +1,91 @@
+import logging
+
+from collections import defaultdict
+
+_logger = logging.getLogger(__name__)
+
+
+def reconcile_payments_with_invoices(env, pairs):
+    """ Reconcile the receivable lines of many payments with those of their invoice, in batch.
+
+    The open receivable lines of all the payments and invoices are fetched in one query and
+    reconciled with a single reconciliation plan, grouped by invoice and account. The payment
+    states are then recomputed once for the whole batch, and the payments which are reconciled,
+    matched or whose invoice is paid are moved from 'in_process' to 'paid'.
+
+    When the batch reconciliation fails, the groups are reconciled one by one in a savepoint so
+    that a failing group does not prevent the others from being reconciled.
+
+    :param env: The environment to run the reconciliation in
+    :param list pairs: The (payment, invoice) pairs to reconcile, as (`account.payment`,
+                       `account.move`) records. Pairs without invoice or payment move are ignored.
+    :return: The payments set as paid
+    :rtype: recordset of `account.payment`
+    """
+    pairs = [(payment, invoice) for payment, invoice in pairs if payment and invoice and payment.move_id]
+    if not pairs:
+        return env['account.payment']
+
+    payments = env['account.payment'].union(*(payment for payment, _invoice in pairs))
+    invoices = env['account.move'].union(*(invoice for _payment, invoice in pairs))
+
+    # Fetch the open receivable lines of all the moves at once
+    lines = env['account.move.line'].search([
+        ('move_id', 'in', invoices.ids + payments.move_id.ids),
+        ('account_id.account_type', '=', 'asset_receivable'),
+        ('reconciled', '=', False),
+    ])
+    line_ids_by_account_by_move = defaultdict(lambda: defaultdict(list))
+    for line in lines:
+        line_ids_by_account_by_move[line.move_id.id][line.account_id.id].append(line.id)
+
+    payment_move_ids_by_invoice = defaultdict(set)
+    for payment, invoice in pairs:
+        payment_move_ids_by_invoice[invoice.id].add(payment.move_id.id)
+
+    # One group per invoice and receivable account, with the lines of the invoice and its payments
+    plan = []
+    for invoice_id, payment_move_ids in payment_move_ids_by_invoice.items():
+        for account_id, invoice_line_ids in line_ids_by_account_by_move[invoice_id].items():
+            payment_line_ids = [
+                line_id
+                for payment_move_id in payment_move_ids
+                for line_id in line_ids_by_account_by_move[payment_move_id].get(account_id, ())
+            ]
+            if payment_line_ids:
+                plan.append(env['account.move.line'].browse(invoice_line_ids + payment_line_ids))
+
+    _logger.info('|Reconciliation| Reconciling %s payments with %s invoices (%s groups)',
+                 len(payments), len(invoices), len(plan))
+    if plan:
+        try:
+            with env.cr.savepoint():
+                env['account.move.line']._reconcile_plan(plan)
+        except Exception as e:
+            _logger.warning('|Reconciliation| Batch reconciliation failed, reconciling one by one: %s', str(e))
+            for lines_to_reconcile in plan:
+                try:
+                    with env.cr.savepoint():
+                        lines_to_reconcile.reconcile()
+                except Exception as e:
+                    _logger.warning('|Reconciliation| Error reconciling lines %s: %s', lines_to_reconcile.ids, str(e))
+
+    # Recompute the reconciliation state of the whole batch at once
+    payments.invalidate_recordset(['is_reconciled', 'is_matched'])
+    invoices.invalidate_recordset(['payment_state', 'amount_residual'])
+    env.flush_all()
+
+    # A payment should be marked 'paid' when it's in 'in_process' state and either it is fully
+    # reconciled or matched, or its invoice is fully paid. This handles both partial payments (where
+    # the invoice isn't fully paid yet) and final payments (where the invoice becomes fully paid).
+    paid_invoice_ids = set(invoices.filtered(lambda move: move.payment_state == 'paid').ids)
+    paid_payments = env['account.payment'].union(*(
+        payment
+        for payment, invoice in pairs
+        if payment.state == 'in_process'
+        and (payment.is_reconciled or payment.is_matched or invoice.id in paid_invoice_ids)
+    ))
+    if paid_payments:
+        paid_payments.write({'state': 'paid'})
+    _logger.info('|Reconciliation| %s payments set as paid', len(paid_payments))
+    return paid_payments
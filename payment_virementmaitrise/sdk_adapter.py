@@ -7,10 +7,24 @@ on the tenant configuration.
 
 The SDK is lazily loaded once at module level and cached for all subsequent uses.
 This provides both clean module-level imports and high performance.
+
+The SDK reads its credentials from module globals. To let several providers (or
+databases) call the API concurrently from one process, credentials are held by
+FintectureClient instances: while a client is bound, the credential attributes
+of the SDK module resolve to that client instead of the globals.
 """
 
+import contextlib
+import contextvars
 import importlib
 import logging
+import threading
+import time
+import types
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
 from . import const
 
 _logger = logging.getLogger(__name__)
@@ -39,7 +53,10 @@ def _load_sdk():
     _logger.info(f'|SDKAdapter| Loading SDK module: {sdk_import_name}')
 
     try:
-        _sdk_module = importlib.import_module(sdk_import_name)
+        sdk_module = importlib.import_module(sdk_import_name)
+        if type(sdk_module) is types.ModuleType:
+            sdk_module.__class__ = _ClientAwareModule
+        _sdk_module = sdk_module
         _logger.info(f'|SDKAdapter| Successfully loaded SDK: {sdk_import_name}')
         return _sdk_module
     except ImportError as e:
@@ -51,6 +68,231 @@ def _load_sdk():
         ) from e
 
 
+# ============================================================================
+# PER-PROVIDER CLIENTS
+# ============================================================================
+
+# SDK module attributes holding the credentials and HTTP transport of the current client
+CLIENT_ATTRIBUTES = ('env', 'app_id', 'app_secret', 'private_key', 'access_token', 'default_http_client')
+
+# The client bound in the current thread/greenlet, if any
+_active_client = contextvars.ContextVar('fintecture_client', default=None)
+
+
+def _make_client_attribute(name):
+    """ Build a property resolving `name` on the bound client, or on the module globals otherwise. """
+    def _get(module):
+        client = _active_client.get()
+        if client is not None:
+            return getattr(client, name)
+        return vars(module).get(name)
+
+    def _set(module, value):
+        client = _active_client.get()
+        if client is not None:
+            setattr(client, name, value)
+        else:
+            vars(module)[name] = value
+
+    return property(_get, _set)
+
+
+class _ClientAwareModule(types.ModuleType):
+    """ Module type installed on the SDK so that its credentials follow the bound client. """
+
+
+for _attribute in CLIENT_ATTRIBUTES:
+    setattr(_ClientAwareModule, _attribute, _make_client_attribute(_attribute))
+
+
+class FintectureClient:
+    """
+    Isolated set of SDK credentials for one provider.
+
+    Usage:
+        with client.bound():
+            fintecture.PIS.request_to_pay(...)
+
+    The binding is stored in a context variable, so concurrent threads or greenlets
+    each use their own client. Code running in a thread pool must bind the client
+    inside the submitted function.
+    """
+    __slots__ = ('key',) + CLIENT_ATTRIBUTES
+
+    def __init__(self, key, **credentials):
+        self.key = key
+        for name in CLIENT_ATTRIBUTES:
+            setattr(self, name, credentials.get(name))
+
+    @contextlib.contextmanager
+    def bound(self):
+        """ Make the SDK use this client for the duration of the `with` block. """
+        _load_sdk()
+        token = _active_client.set(self)
+        try:
+            yield self
+        finally:
+            _active_client.reset(token)
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def run_concurrently(client, func, calls, max_workers):
+    """
+    Call an SDK function several times in parallel with a client bound in each worker thread.
+
+    The calls must not touch the ORM: records and environments are not thread-safe.
+
+    Args:
+        client (FintectureClient): The client to bind in the worker threads
+        func (callable): The SDK function to call
+        calls (list): The keyword arguments of each call
+        max_workers (int): The maximum number of concurrent calls
+
+    Returns:
+        list: The result of each call, or the exception it raised, in the same order
+    """
+    def _call(kwargs):
+        with client.bound():
+            try:
+                return func(**kwargs)
+            except Exception as e:
+                return e
+
+    if not calls:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(calls)))) as executor:
+        return list(executor.map(_call, calls))
+
+
+def get_client(key, version, build_client):
+    """
+    Return the cached client for `key`, building a new one when `version` changed.
+
+    Args:
+        key (tuple): Identifies the client, typically (dbname, provider id)
+        version: Any value changing with the credentials, typically the provider's write_date
+        build_client (callable): Called without arguments to build a new FintectureClient
+
+    Returns:
+        FintectureClient: The client
+    """
+    entry = _clients.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    client = build_client()
+    with _clients_lock:
+        _clients[key] = (version, client)
+    _logger.info(f'|SDKAdapter| Built new client for {key}')
+    return client
+
+
+def invalidate_client(key):
+    """ Drop the cached client for `key`, if any. """
+    with _clients_lock:
+        _clients.pop(key, None)
+
+
+def reset_client_cache():
+    """ Drop all cached clients. Useful for testing. """
+    with _clients_lock:
+        _clients.clear()
+
+
+# ============================================================================
+# HTTP CONNECTION POOLS
+# ============================================================================
+# One keep-alive connection pool per environment and configuration, shared by
+# all the clients (and threads) of the process, so that TLS connections to the
+# API are reused across requests.
+
+_http_clients = {}
+_http_clients_lock = threading.Lock()
+
+
+def get_http_client(environment, pool_maxsize, timeout):
+    """
+    Return the pooled HTTP client of the SDK for an environment.
+
+    Args:
+        environment (str): The SDK environment the client is used for
+        pool_maxsize (int): The maximum number of connections kept alive per host
+        timeout (tuple): The (connect, read) timeouts in seconds
+
+    Returns:
+        The SDK HTTP client, or None to let the SDK use its default client if it
+        does not provide a requests-based one
+    """
+    key = (environment, pool_maxsize, timeout)
+    with _http_clients_lock:
+        entry = _http_clients.get(key)
+        if entry is not None:
+            return entry[0]
+
+        requests_client_class = getattr(getattr(_load_sdk(), 'http_client', None), 'RequestsClient', None)
+        if requests_client_class is None:
+            _logger.warning('|SDKAdapter| SDK has no requests-based HTTP client, connection pooling disabled')
+            return None
+
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        http_client = requests_client_class(timeout=timeout, session=session)
+        _http_clients[key] = (http_client, adapter)
+        _logger.info(f'|SDKAdapter| Created HTTP connection pool for {environment} (maxsize={pool_maxsize})')
+        return http_client
+
+
+def get_http_pool_stats():
+    """
+    Return the connection reuse counters of the HTTP pools of this process.
+
+    A hit is a request sent on a kept-alive connection, a miss is a request which
+    had to open a new connection.
+
+    Returns:
+        dict: {environment: {'hits': int, 'misses': int}}
+    """
+    stats = {}
+    with _http_clients_lock:
+        entries = list(_http_clients.items())
+    for (environment, _pool_maxsize, _timeout), (_http_client, adapter) in entries:
+        counters = stats.setdefault(environment, {'hits': 0, 'misses': 0})
+        pools = adapter.poolmanager.pools
+        for pool_key in pools.keys():
+            pool = pools.get(pool_key)
+            if pool is None:
+                continue
+            counters['misses'] += pool.num_connections
+            counters['hits'] += max(pool.num_requests - pool.num_connections, 0)
+    return stats
+
+
+def reset_http_clients():
+    """ Close and drop all the HTTP connection pools. Useful for testing. """
+    with _http_clients_lock:
+        for _http_client, adapter in _http_clients.values():
+            adapter.close()
+        _http_clients.clear()
+
+
+_app_info = None
+
+
+def set_app_info(name, version):
+    """ Set the application info sent in the User-Agent, only calling the SDK when it changes. """
+    global _app_info
+
+    if _app_info == (name, version):
+        return
+    fintecture.set_app_info(name, version=version)
+    _app_info = (name, version)
+
+
 class _SDKProxy:
     """
     Proxy class that forwards all attribute access to the dynamically loaded SDK module.
@@ -80,6 +322,133 @@ def reset_sdk_cache():
 
     Note: This should rarely be needed in production code.
     """
-    global _sdk_module
+    global _sdk_module, _app_info
     _sdk_module = None
+    _app_info = None
     _logger.info('|SDKAdapter| SDK cache reset')
+
+
+# ============================================================================
+# OAUTH ACCESS TOKEN CACHE
+# ============================================================================
+# Access tokens are cached per process and keyed by the caller (typically
+# (dbname, provider id, app_id, environment)). A per-key lock ensures that
+# concurrent threads needing a fresh token trigger a single OAuth round trip.
+
+_token_cache = {}
+_token_locks = {}
+_token_cache_lock = threading.Lock()
+
+
+def _get_valid_token(key, stale_token=None):
+    """ Return the cached token for `key` if it is still usable, None otherwise. """
+    entry = _token_cache.get(key)
+    if entry is None:
+        return None
+    access_token, expires_at = entry
+    if access_token == stale_token or expires_at - const.OAUTH_TOKEN_EXPIRY_MARGIN <= time.monotonic():
+        return None
+    return access_token
+
+
+def get_access_token(key, fetch_token, stale_token=None):
+    """
+    Return a valid access token for `key`, fetching a new one only when needed.
+
+    Args:
+        key (tuple): The cache key identifying the credentials set
+        fetch_token (callable): Called without arguments on cache miss, must return a
+            tuple (access_token, expires_in) where expires_in is a number of seconds
+        stale_token (str): A token known to be rejected by the API; it is never returned
+            and triggers a refresh unless another thread already replaced it
+
+    Returns:
+        str: The access token
+    """
+    access_token = _get_valid_token(key, stale_token)
+    if access_token:
+        return access_token
+
+    with _token_cache_lock:
+        key_lock = _token_locks.setdefault(key, threading.Lock())
+
+    with key_lock:
+        # Another thread may have refreshed the token while we were waiting
+        access_token = _get_valid_token(key, stale_token)
+        if access_token:
+            return access_token
+
+        access_token, expires_in = fetch_token()
+        _token_cache[key] = (access_token, time.monotonic() + float(expires_in or 0))
+        _logger.info(f'|SDKAdapter| Cached new access token (expires in {expires_in}s)')
+        return access_token
+
+
+def invalidate_access_token(key):
+    """ Drop the cached token for `key`, if any. """
+    _token_cache.pop(key, None)
+
+
+def reset_token_cache():
+    """ Drop all cached access tokens. Useful for testing. """
+    with _token_cache_lock:
+        _token_cache.clear()
+        _token_locks.clear()
+
+
+def is_unauthorized_error(error):
+    """
+    Return whether an exception raised by the SDK means the access token was rejected.
+
+    Args:
+        error (Exception): The exception raised by an SDK call
+
+    Returns:
+        bool: True if the API answered with HTTP 401
+    """
+    return getattr(error, 'http_status', None) == 401
+
+
+# ============================================================================
+# PAYMENT SESSIONS
+# ============================================================================
+
+def get_payment_session(session_id):
+    """
+    Return the payment session resource of `session_id`, without retrieving it when possible.
+
+    The SDK resources can be built from their id alone, which is all the instance
+    methods like `refund` need. The session is only retrieved from the API when the
+    SDK cannot build it.
+
+    Args:
+        session_id (str): The Fintecture session id
+
+    Returns:
+        The `Payment` resource
+    """
+    payment_class = _load_sdk().Payment
+    construct_from = getattr(payment_class, 'construct_from', None)
+    if construct_from is not None:
+        try:
+            return construct_from({'id': session_id}, None)
+        except TypeError:
+            _logger.debug('|SDKAdapter| Payment resources cannot be built locally, retrieving them')
+    return payment_class.retrieve(session_id)
+
+
+def refund_payment_session(session_id, data):
+    """
+    Refund a payment session, without retrieving it first when possible.
+
+    Args:
+        session_id (str): The Fintecture session id
+        data (dict): The refund data sent to the API
+
+    Returns:
+        The refund response of the API
+    """
+    session = get_payment_session(session_id)
+    if not session:
+        raise ValueError(f'Payment session {session_id} not found.')
+    return session.refund(data=data)
@@ -1,3 +1,4 @@
 
 from . import common
 from . import test_fintecture
+from . import test_account_move
@@ -1,7 +1,8 @@
 import base64
 
 from odoo.addons.payment.tests.common import PaymentCommon
-from ..const import PAYMENT_PROVIDER_NAME
+from .. import sdk_adapter
+from ..const import PAYMENT_PROVIDER_NAME, SDK_IMPORT_NAME
 
 
 class FintectureCommon(PaymentCommon):
@@ -46,3 +47,9 @@ M/VgNW3Ghn47o21UJav6rcZ=
         })
 
         cls.provider = cls.fintecture
+
+    def setUp(self):
+        super().setUp()
+        # Access tokens and clients are cached per process and would leak between tests
+        sdk_adapter.reset_token_cache()
+        sdk_adapter.reset_client_cache()
@@ -0,0 +1,334 @@
+import logging
+import time
+
+from datetime import timedelta
+
+from unittest import SkipTest
+from unittest.mock import patch
+
+from odoo import Command, fields
+from odoo.models import INSERT_BATCH_SIZE
+from odoo.addons.account_payment.tests.common import AccountPaymentCommon
+from odoo.modules.registry import Registry
+from odoo.tests import HttpCase, tagged
+from odoo.tests.common import get_db_name
+
+from .common import FintectureCommon, SDK_IMPORT_NAME
+from ..const import PAY_URL, PAYMENT_PROVIDER_NAME
+from ..reconciliation import reconcile_payments_with_invoices
+
+_logger = logging.getLogger(__name__)
+
+
+class FintectureAccountMoveCommon(FintectureCommon, AccountPaymentCommon):
+
+    @classmethod
+    def setUpClass(cls):
+        # The invoice integration is only loaded when the account module is installed
+        if 'account.payment' not in Registry(get_db_name()):
+            raise SkipTest("account_payment is not installed")
+        super().setUpClass()
+        cls.fintecture.fintecture_invoice_link_qr = True
+
+    def _create_invoices(self, count):
+        invoices = self.env['account.move'].create([{
+            'move_type': 'out_invoice',
+            'partner_id': self.partner_a.id,
+            'invoice_date': '2026-01-01',
+            'invoice_line_ids': [Command.create({
+                'name': f'line {index}',
+                'price_unit': 100.0,
+                'quantity': 1,
+                'tax_ids': [],
+            })],
+        } for index in range(count)])
+        invoices.action_post()
+        return invoices
+
+    def _create_payments(self, invoices):
+        payments = self.env['account.payment'].create([{
+            'payment_type': 'inbound',
+            'partner_type': 'customer',
+            'partner_id': invoice.partner_id.id,
+            'amount': invoice.amount_residual,
+            'currency_id': invoice.currency_id.id,
+            'journal_id': self.company_data['default_journal_bank'].id,
+        } for invoice in invoices])
+        payments.action_post()
+        return payments
+
+    def _count_materialize_queries(self, invoices):
+        """Return the number of queries needed to materialize the payment data of the invoices."""
+        self.env.flush_all()
+        self.env.invalidate_all()
+
+        def request_to_pay(**kwargs):
+            reference = kwargs['data']['attributes']['communication'].split(' ')[-1]
+            return {'meta': {'session_id': f'session-{reference}', 'url': f'https://pay.test/{reference}'}}
+
+        with patch(f'{SDK_IMPORT_NAME}.PIS.oauth', return_value={
+            'access_token': 'invoice_token',
+            'expires_in': 3600
+        }), patch(f'{SDK_IMPORT_NAME}.PIS.request_to_pay', side_effect=request_to_pay):
+            start = self.cr.sql_log_count
+            invoices._fintecture_materialize_payment_data()
+            self.env.flush_all()
+            return self.cr.sql_log_count - start
+
+
+@tagged('post_install', '-at_install')
+class FintectureAccountMoveTest(FintectureAccountMoveCommon):
+
+    def test_materialize_payment_data_is_batched(self):
+        """Test that the number of queries grows with the ORM batches, not with the number of invoices."""
+        few_invoices = self._create_invoices(10)
+        batch_invoices = self._create_invoices(INSERT_BATCH_SIZE)
+        many_invoices = self._create_invoices(1000)
+
+        few_queries = self._count_materialize_queries(few_invoices)
+        batch_queries = self._count_materialize_queries(batch_invoices)
+        many_queries = self._count_materialize_queries(many_invoices)
+
+        self.assertTrue(all(many_invoices.mapped('fintecture_payment_link')))
+        self.assertTrue(all(many_invoices.mapped('fintecture_payment_qr')))
+        self.assertEqual(len(many_invoices.transaction_ids), 1000)
+        # Up to a full ORM insert/update chunk, not a single query may be added
+        self.assertEqual(batch_queries, few_queries)
+        # Beyond it, the ORM only adds queries per chunk of records
+        batch_count = -(-len(many_invoices) // INSERT_BATCH_SIZE)
+        self.assertLessEqual(many_queries, few_queries * batch_count)
+        self.assertLess(many_queries, len(many_invoices))
+
+    def test_ensure_payment_data_only_materializes_given_invoices(self):
+        """Test that only the invoices rendered by the report are materialized, not the prefetched ones."""
+        invoices = self._create_invoices(3)
+        # The slices keep the whole recordset as prefetch ids
+        rendered, other = invoices[:2], invoices[2]
+
+        with patch(f'{SDK_IMPORT_NAME}.PIS.oauth', return_value={
+            'access_token': 'report_token',
+            'expires_in': 3600
+        }), patch(f'{SDK_IMPORT_NAME}.PIS.request_to_pay', return_value={
+            'meta': {'session_id': 'session-report', 'url': 'https://pay.test/report'}
+        }) as mock_request_to_pay:
+            rendered._fintecture_ensure_payment_data()
+
+        self.assertEqual(mock_request_to_pay.call_count, 2)
+        self.assertTrue(all(rendered.mapped('fintecture_payment_link')))
+        self.assertFalse(other.fintecture_payment_link)
+        self.assertFalse(other.transaction_ids)
+
+    def test_materialize_payment_data_reuses_transaction(self):
+        """Test that an invoice keeps its transaction when its payment data is materialized again."""
+        invoice = self._create_invoices(1)
+        self._count_materialize_queries(invoice)
+        tx = invoice.transaction_ids
+
+        invoice.fintecture_payment_link = False
+        self._count_materialize_queries(invoice)
+
+        self.assertEqual(invoice.transaction_ids, tx)
+        self.assertEqual(invoice.fintecture_payment_link, tx.fintecture_url)
+
+    def test_transaction_links_its_invoice(self):
+        """Test that the transaction created for an invoice stores it as its primary invoice."""
+        invoice = self._create_invoices(1)
+        self._count_materialize_queries(invoice)
+        tx = invoice.transaction_ids
+
+        self.assertEqual(tx.fintecture_invoice_id, invoice)
+        self.assertEqual(tx._fintecture_get_invoice_by_tx_id(), {tx.id: invoice})
+
+    def test_sessions_close_to_expiry_are_refreshed(self):
+        """Test that the payment link of an invoice is replaced before its session expires."""
+        invoice = self._create_invoices(1)
+        self._count_materialize_queries(invoice)
+        tx = invoice.transaction_ids
+        tx.fintecture_expires_at = fields.Datetime.now() + timedelta(hours=1)
+
+        with patch(f'{SDK_IMPORT_NAME}.PIS.oauth', return_value={
+            'access_token': 'refresh_token',
+            'expires_in': 3600
+        }), patch(f'{SDK_IMPORT_NAME}.PIS.request_to_pay', return_value={
+            'meta': {'session_id': 'session-refreshed', 'url': 'https://pay.test/refreshed'}
+        }):
+            self.env['payment.transaction']._cron_fintecture_refresh_expiring_sessions()
+
+        self.assertEqual(tx.provider_reference, 'session-refreshed')
+        self.assertEqual(invoice.fintecture_payment_link, 'https://pay.test/refreshed')
+        self.assertGreater(tx.fintecture_expires_at, fields.Datetime.now() + timedelta(hours=1))
+
+    def test_replaced_session_still_finds_its_transaction(self):
+        """Test that a session replaced before expiry, still printed on sent invoices, can be paid."""
+        invoice = self._create_invoices(1)
+        self._count_materialize_queries(invoice)
+        tx = invoice.transaction_ids
+        old_session_id = tx.provider_reference
+        tx.fintecture_expires_at = fields.Datetime.now() + timedelta(hours=1)
+
+        with patch(f'{SDK_IMPORT_NAME}.PIS.oauth', return_value={
+            'access_token': 'refresh_token',
+            'expires_in': 3600
+        }), patch(f'{SDK_IMPORT_NAME}.PIS.request_to_pay', return_value={
+            'meta': {'session_id': 'session-replacing', 'url': 'https://pay.test/replacing'}
+        }):
+            self.env['payment.transaction']._cron_fintecture_refresh_expiring_sessions()
+
+        tx_model = self.env['payment.transaction'].sudo()
+        self.assertEqual(tx.fintecture_previous_session_ids.session_id, old_session_id)
+        self.assertEqual(tx_model._fintecture_get_tx_by_session(old_session_id), tx)
+        self.assertEqual(
+            tx_model._get_tx_from_notification_data(PAYMENT_PROVIDER_NAME, {'session_id': old_session_id}), tx
+        )
+        self.assertEqual(tx_model._fintecture_get_tx_by_session('session-replacing'), tx)
+
+    def test_expired_session_of_pending_transaction_is_not_served(self):
+        """Test that an invoice never links the expired session of its pending transaction."""
+        invoice = self._create_invoices(1)
+        self._count_materialize_queries(invoice)
+        tx = invoice.transaction_ids
+        tx._set_pending()
+        tx.fintecture_expires_at = fields.Datetime.now() - timedelta(minutes=1)
+        expired_url = tx.fintecture_url
+
+        invoice.fintecture_payment_link = False
+        self._count_materialize_queries(invoice)
+
+        self.assertEqual(tx.fintecture_url, expired_url, "The session of a pending transaction is kept")
+        self.assertEqual(invoice.fintecture_payment_link, invoice._fintecture_get_deferred_payment_url())
+        self.assertFalse(invoice._fintecture_get_payment_session_url())
+
+    def test_changed_invoice_gets_a_new_session(self):
+        """Test that a session is never served for an amount the invoice no longer has."""
+        invoice = self._create_invoices(1)
+        self._count_materialize_queries(invoice)
+        old_tx = invoice.transaction_ids
+
+        invoice.button_draft()
+        invoice.invoice_line_ids.price_unit = 150.0
+        invoice.action_post()
+        self.assertFalse(invoice.fintecture_payment_link)
+
+        with patch(f'{SDK_IMPORT_NAME}.PIS.oauth', return_value={
+            'access_token': 'changed_token',
+            'expires_in': 3600
+        }), patch(f'{SDK_IMPORT_NAME}.PIS.request_to_pay', return_value={
+            'meta': {'session_id': 'session-changed', 'url': 'https://pay.test/changed'}
+        }) as mock_request_to_pay:
+            invoice._fintecture_materialize_payment_data()
+
+        new_tx = invoice.transaction_ids - old_tx
+        self.assertEqual(old_tx.state, 'cancel')
+        self.assertEqual(new_tx.amount, 150.0)
+        self.assertEqual(mock_request_to_pay.call_args.kwargs['data']['attributes']['amount'], '150.0')
+        self.assertEqual(invoice.fintecture_payment_link, 'https://pay.test/changed')
+
+    def test_credentials_change_cancels_draft_sessions(self):
+        """Test that the sessions requested with former credentials are not served anymore."""
+        invoice = self._create_invoices(1)
+        self._count_materialize_queries(invoice)
+        tx = invoice.transaction_ids
+
+        self.fintecture.write({
+            'state': self.fintecture.state,
+            'fintecture_pis_app_secret': self.fintecture.fintecture_pis_app_secret,
+        })
+        self.assertEqual(tx.state, 'draft', "Writing the same credentials again should keep the sessions")
+        self.assertEqual(invoice.fintecture_payment_link, tx.fintecture_url)
+
+        self.fintecture.fintecture_pis_app_secret = 'new_app_secret'
+
+        self.assertEqual(tx.state, 'cancel')
+        self.assertFalse(invoice.fintecture_payment_link)
+
+    def test_reconcile_payments_with_invoices(self):
+        """Test that many payments are reconciled with their invoice in one batch."""
+        invoices = self._create_invoices(5)
+        payments = self._create_payments(invoices)
+
+        paid_payments = reconcile_payments_with_invoices(self.env, list(zip(payments, invoices)))
+
+        self.assertEqual(set(invoices.mapped('payment_state')), {'paid'})
+        self.assertEqual(paid_payments, payments)
+        self.assertEqual(set(payments.mapped('state')), {'paid'})
+
+
+@tagged('post_install', '-at_install')
+class FintectureInvoicePayLinkTest(FintectureAccountMoveCommon, HttpCase):
+
+    def setUp(self):
+        super().setUp()
+        self.invoice = self._create_invoices(1)
+        self.invoice._fintecture_ensure_access_tokens()
+
+    def _open_pay_link(self, access_token=None):
+        url = f'{PAY_URL}/{self.invoice.id}/{access_token or self.invoice.access_token}'
+        return self.url_open(url, allow_redirects=False)
+
+    def test_access_tokens_are_generated_without_overwriting(self):
+        """Test that the missing access tokens are generated and the existing ones kept."""
+        token = self.invoice.access_token
+        other_invoice = self._create_invoices(1)
+
+        (self.invoice | other_invoice)._fintecture_ensure_access_tokens()
+
+        self.assertEqual(self.invoice.access_token, token)
+        self.assertTrue(other_invoice.access_token)
+
+    def test_pay_link_with_invalid_token_is_not_found(self):
+        """Test that the payment link requires the access token of the invoice."""
+        with patch(f'{SDK_IMPORT_NAME}.PIS.request_to_pay') as mock_request_to_pay:
+            response = self._open_pay_link(access_token='invalid-token')
+
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(mock_request_to_pay.call_count, 0)
+
+    def test_pay_link_of_unpayable_invoice_redirects_to_portal(self):
+        """Test that no session is created for an invoice which cannot be paid anymore."""
+        self.invoice.button_draft()
+
+        with patch(f'{SDK_IMPORT_NAME}.PIS.request_to_pay') as mock_request_to_pay:
+            response = self._open_pay_link()
+
+        self.assertEqual(response.status_code, 303)
+        self.assertIn(self.invoice.get_portal_url().split('?')[0], response.headers['Location'])
+        self.assertEqual(mock_request_to_pay.call_count, 0)
+        self.assertFalse(self.invoice.transaction_ids)
+
+    def test_pay_link_creates_session_once(self):
+        """Test that the session is created when the link is first opened and reused afterwards."""
+        with patch(f'{SDK_IMPORT_NAME}.PIS.oauth', return_value={
+            'access_token': 'pay_link_token',
+            'expires_in': 3600
+        }), patch(f'{SDK_IMPORT_NAME}.PIS.request_to_pay', return_value={
+            'meta': {'session_id': 'session-pay-link', 'url': 'https://pay.test/pay-link'}
+        }) as mock_request_to_pay:
+            first_response = self._open_pay_link()
+            second_response = self._open_pay_link()
+
+        self.assertEqual(mock_request_to_pay.call_count, 1)
+        self.assertEqual(first_response.headers['Location'], 'https://pay.test/pay-link')
+        self.assertEqual(second_response.headers['Location'], 'https://pay.test/pay-link')
+        self.env.invalidate_all()
+        self.assertEqual(self.invoice.transaction_ids.provider_reference, 'session-pay-link')
+
+
+@tagged('post_install', '-at_install', '-standard', 'fintecture_benchmark')
+class FintectureReconciliationBenchmark(FintectureAccountMoveCommon):
+
+    def test_reconciliation_throughput(self):
+        """Measure the reconciliation throughput of 10,000 payment/invoice pairs."""
+        invoices = self._create_invoices(10000)
+        payments = self._create_payments(invoices)
+        self.env.flush_all()
+        self.env.invalidate_all()
+
+        start_time = time.perf_counter()
+        start_queries = self.cr.sql_log_count
+        reconcile_payments_with_invoices(self.env, list(zip(payments, invoices)))
+        self.env.flush_all()
+        duration = time.perf_counter() - start_time
+
+        _logger.info('Reconciled %s pairs in %.1f s (%.0f pairs/s, %s queries)',
+                     len(invoices), duration, len(invoices) / duration, self.cr.sql_log_count - start_queries)
+        self.assertEqual(set(invoices.mapped('payment_state')), {'paid'})
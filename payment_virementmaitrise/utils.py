@@ -1,3 +1,12 @@
+import logging
+
+from odoo.modules import module as odoo_module
+
+from .const import MODULE_NAME
+
+_logger = logging.getLogger(__name__)
+
+
 def get_pis_app_id(provider_sudo):
     """ Return the publishable key for PIS Application.
 
@@ -36,3 +45,30 @@ def get_pis_private_key(provider_sudo):
     """
     return provider_sudo.fintecture_pis_private_key_file
 
+
+def get_int_param(env, key, default):
+    """ Return the integer value of the system parameter `payment_virementmaitrise.<key>`.
+
+    :param env: The Odoo environment
+    :param str key: The parameter key, without the module prefix
+    :param int default: The value to return if the parameter is not set or invalid
+    :return: The parameter value
+    :rtype: int
+    """
+    value = env['ir.config_parameter'].sudo().get_param(f'{MODULE_NAME}.{key}')
+    if not value:
+        return default
+    try:
+        return int(value)
+    except ValueError:
+        _logger.warning("Invalid value %r for system parameter %s.%s, using %s", value, MODULE_NAME, key, default)
+        return default
+
+
+def can_commit():
+    """ Return whether the cron jobs may commit their progress, which is forbidden during tests.
+
+    :return: Whether the cursor may be committed
+    :rtype: bool
+    """
+    return not odoo_module.current_test
@@ -0,0 +1,86 @@
+import logging
+
+from dataclasses import dataclass
+
+_logger = logging.getLogger(__name__)
+
+
+def _parse_amount(value):
+    """ Return an amount sent by Fintecture as a float.
+
+    :param str value: The amount, as received in the notification
+    :return: The amount, or None if it is missing or invalid
+    :rtype: float
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except (ValueError, TypeError):
+        _logger.warning('|WebhookEventContext| Invalid amount: %s', value)
+        return None
+
+
+@dataclass(slots=True)
+class WebhookEventContext:
+    """ A webhook notification, parsed once and carried through every stage of its processing.
+
+    The records it concerns are resolved once by `resolve_records` and then reused by all the
+    stages instead of being searched again by each of them. The transfer fields are set when the
+    transfer is recorded, see `payment.transaction._fintecture_record_transfer`.
+    """
+    notification_data: dict
+    session_id: str = None
+    status: str = None
+    transfer_state: str = None
+    fintecture_transaction_id: str = None
+    received_amount: float = None
+    transaction_amount: float = None
+    last_transaction_amount: float = None
+    tx: object = None
+    provider: object = None
+    invoice: object = None
+    sale_order: object = None
+    existing_payments: object = None
+    is_new_transfer: bool = False
+    transfer_amount: float = 0.0
+    previous_received_amount: float = 0.0
+
+    @classmethod
+    def from_notification(cls, notification_data):
+        """ Parse the notification data.
+
+        :param dict notification_data: The form data of the notification
+        :return: The context of the notification
+        :rtype: WebhookEventContext
+        """
+        return cls(
+            notification_data=notification_data,
+            session_id=notification_data.get('session_id'),
+            status=notification_data.get('status'),
+            transfer_state=notification_data.get('transfer_state'),
+            fintecture_transaction_id=notification_data.get('transaction_id'),
+            received_amount=_parse_amount(notification_data.get('received_amount')),
+            transaction_amount=_parse_amount(notification_data.get('transaction_amount')),
+            last_transaction_amount=_parse_amount(notification_data.get('last_transaction_amount')),
+        )
+
+    def resolve_records(self, tx):
+        """ Resolve the provider, invoice, sale order and existing payments of the transaction.
+
+        :param recordset tx: The notified transaction, as a sudoed `payment.transaction` record
+        :return: None
+        """
+        env = tx.env
+        self.tx = tx
+        self.provider = tx.provider_id
+        self.invoice = tx._fintecture_get_invoice_by_tx_id().get(tx.id)
+        self.sale_order = tx._fintecture_get_sale_order_by_tx_id().get(tx.id)
+        self.existing_payments = env['account.payment'].search([
+            ('payment_transaction_id', '=', tx.id),
+            ('state', 'in', ['posted', 'in_process', 'paid']),
+        ]) if 'account.payment' in env else None
+
+    @property
+    def total_existing_amount(self):
+        return sum(payment.amount for payment in self.existing_payments or ())